@@ -7,12 +7,13 @@ load_dotenv()
 
 from flask import Flask, jsonify
 from config import Config
-from extensions import db, jwt, bcrypt
+from extensions import db, jwt, bcrypt, metrics, replicas
+from services.audit_service import audit
 from flask_cors import CORS
 
 # Import blueprints
 from routes.general import general_bp
-from routes.auth import auth_bp
+from routes.auth import auth_bp, revocations
 from routes.files import files_bp
 from routes.admin import admin_bp
 from routes.users import users_bp
@@ -25,8 +26,6 @@ def create_app(config_class=Config):
     # ==============================
     # FILE UPLOAD SETTINGS
     # ==============================
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB limit
-
     upload_folder = app.config.get('UPLOAD_FOLDER', 'uploads')
 
     if not os.path.exists(upload_folder):
@@ -38,8 +37,12 @@ def create_app(config_class=Config):
     # INITIALIZE EXTENSIONS
     # ==============================
     db.init_app(app)
+    replicas.init_app(app, db)
     jwt.init_app(app)
+    revocations.init_app(jwt)
     bcrypt.init_app(app)
+    metrics.init_app(app)
+    audit.init_app(app)
 
     # ==============================
     # ENABLE CORS (FIXED)
@@ -94,7 +97,8 @@ def create_app(config_class=Config):
 
     @app.errorhandler(413)
     def handle_413(e):
-        return jsonify({"success": False, "message": "File too large (Max 16MB)"}), 413
+        max_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+        return jsonify({"success": False, "message": f"File too large (Max {max_mb}MB)"}), 413
 
     @app.errorhandler(500)
     def handle_500(e):
@@ -0,0 +1,326 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.dlp_engine import DLPEngine, LUHN_DOUBLED, VERHOEFF_D, VERHOEFF_P
+from services.encryption_service import EncryptionService
+
+# Usage:
+#   python benchmark.py run --save baseline           -> benchmarks/baseline.json
+#   python benchmark.py run --sizes 10KB,1MB --save after
+#   python benchmark.py compare baseline after --threshold 10
+#
+# Sizes are the amount of generated text per document; PDF and DOCX files
+# wrap the same text, so their file sizes differ from the label.
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+CORPUS_DIR = os.path.join(tempfile.gettempdir(), 'dlp_bench_corpus')
+
+SIZES = {"10KB": 10 * 1024, "1MB": 1024 * 1024, "16MB": 16 * 1024 * 1024}
+FORMATS = ["txt", "pdf", "docx"]
+
+# Items per KB of text
+DEFAULT_DENSITY = {"card": 0.2, "aadhaar": 0.2, "pan": 0.2, "email": 0.5, "key": 0.05}
+
+WORDS = ["invoice", "customer", "account", "report", "quarter", "total", "amount", "policy",
+         "shipment", "order", "balance", "review", "contract", "payment", "summary", "ref"]
+
+
+# ==========================
+# SYNTHETIC CORPUS
+# ==========================
+def luhn_number(rng, length=16):
+    digits = [4] + [rng.randrange(10) for _ in range(length - 2)]
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        total += digit if i % 2 else LUHN_DOUBLED[digit]
+    digits.append((10 - total % 10) % 10)
+    number = "".join(map(str, digits))
+    return " ".join(number[i:i + 4] for i in range(0, length, 4))
+
+
+def aadhaar_number(rng):
+    digits = [rng.randrange(2, 10)] + [rng.randrange(10) for _ in range(10)]
+    check = 0
+    for i, digit in enumerate(reversed(digits)):
+        check = VERHOEFF_D[check][VERHOEFF_P[(i + 1) % 8][digit]]
+    inverse = [0, 4, 3, 2, 1, 5, 6, 7, 8, 9]
+    digits.append(inverse[check])
+    number = "".join(map(str, digits))
+    return " ".join(number[i:i + 4] for i in range(0, 12, 4))
+
+
+def pan_number(rng):
+    letters = [rng.choice(string.ascii_uppercase) for _ in range(5)]
+    letters[3] = "P"
+    return "".join(letters) + f"{rng.randrange(1, 10000):04d}" + rng.choice(string.ascii_uppercase)
+
+
+def email_address(rng):
+    return f"{rng.choice(WORDS)}.{rng.randrange(1000)}@example.com"
+
+
+def api_key(rng):
+    alphabet = string.ascii_letters + string.digits
+    return "sk_live_" + "".join(rng.choice(alphabet) for _ in range(24))
+
+
+GENERATORS = {
+    "card": luhn_number,
+    "aadhaar": aadhaar_number,
+    "pan": pan_number,
+    "email": email_address,
+    "key": api_key
+}
+
+
+def generate_text(size, density, seed=0):
+    # Filler lines of words and numeric noise, with sensitive items inserted at
+    # the requested rate. Returns the text and how many of each were planted.
+    rng = random.Random(seed)
+    planted = {kind: 0 for kind in density}
+    lines = []
+    length = 0
+    while length < size:
+        words = [rng.choice(WORDS) for _ in range(rng.randrange(6, 14))]
+        words.insert(rng.randrange(len(words)), str(rng.randrange(100000)))
+        # Expected items per line = density * line length / 1 KB
+        line_kb = (sum(map(len, words)) + len(words)) / 1024
+        for kind, per_kb in density.items():
+            if rng.random() < per_kb * line_kb:
+                words.insert(rng.randrange(len(words) + 1), GENERATORS[kind](rng))
+                planted[kind] += 1
+        line = " ".join(words) + "\n"
+        lines.append(line)
+        length += len(line)
+    return "".join(lines), planted
+
+
+def build_pdf(text):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    y = 800
+    for line in text.splitlines():
+        pdf.drawString(20, y, line)
+        y -= 10
+        if y < 40:
+            pdf.showPage()
+            y = 800
+    pdf.save()
+    return buffer.getvalue()
+
+
+def build_docx(text):
+    from docx import Document
+
+    document = Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def load_corpus(size_label, fmt, density, seed):
+    # Generated documents are cached on disk; PDF/DOCX at 16 MB take a while.
+    key = "_".join(f"{kind}{per_kb}" for kind, per_kb in sorted(density.items()))
+    path = os.path.join(CORPUS_DIR, f"{size_label}_{seed}_{key}.{fmt}")
+    text, planted = generate_text(SIZES[size_label], density, seed)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read(), text, planted
+
+    if fmt == "txt":
+        data = text.encode()
+    elif fmt == "pdf":
+        data = build_pdf(text)
+    else:
+        data = build_docx(text)
+
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return data, text, planted
+
+
+# ==========================
+# MEASUREMENT
+# ==========================
+def measure(func, size, repeat):
+    # Best wall time over `repeat` runs, then one extra run under tracemalloc
+    # for peak allocated bytes (tracing slows the code, so it is never timed).
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "bytes": size,
+        "seconds": round(best, 6),
+        "mb_per_s": round(size / best / (1024 * 1024), 3) if best else None,
+        "peak_alloc_bytes": peak
+    }
+
+
+def run(args):
+    density = dict(DEFAULT_DENSITY)
+    for item in filter(None, args.density.split(",")):
+        kind, per_kb = item.split("=")
+        if kind not in GENERATORS:
+            sys.exit(f"Unknown density kind '{kind}' (expected one of {', '.join(GENERATORS)})")
+        density[kind] = float(per_kb)
+
+    engine = DLPEngine()
+    # A budget cut-off would silently shrink the work being timed
+    engine.scan_time_budget = 0
+    encryption = EncryptionService()
+    work_dir = tempfile.mkdtemp(prefix='dlp_bench_')
+    results = {}
+
+    for size_label in args.sizes.split(","):
+        for fmt in args.formats.split(","):
+            data, text, planted = load_corpus(size_label, fmt, density, args.seed)
+            name = f"corpus.{fmt}"
+            plain_path = os.path.join(work_dir, name)
+            encrypted_path = plain_path + ".enc"
+            with open(plain_path, 'wb') as f:
+                f.write(data)
+
+            cases = {
+                "extract_text": (lambda: engine.extract_text(io.BytesIO(data), name), len(data)),
+                "scan_file": (lambda: engine.scan_file(io.BytesIO(data), name), len(data)),
+                "encrypt_file": (lambda: encryption.encrypt_file(plain_path, encrypted_path), len(data)),
+                "decrypt_file": (lambda: encryption.decrypt_file(encrypted_path), len(data))
+            }
+            if fmt == "txt":
+                # Format-independent; run once on the raw text
+                cases["scan_text"] = (lambda: engine.scan_text(text), len(text.encode()))
+
+            for operation, (func, size) in cases.items():
+                key = f"{operation}/{fmt}/{size_label}"
+                results[key] = measure(func, size, args.repeat)
+                results[key]["planted"] = planted
+                print(f"{key:<28} {results[key]['mb_per_s']:>10} MB/s  "
+                      f"peak {results[key]['peak_alloc_bytes'] / (1024 * 1024):.1f} MiB")
+
+            os.remove(plain_path)
+            if os.path.exists(encrypted_path):
+                os.remove(encrypted_path)
+
+    os.rmdir(work_dir)
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "pattern_version": engine.pattern_version,
+            "regex_mode": engine.regex_mode,
+            "encryption_format": encryption.file_format,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "density": density
+        },
+        "results": results
+    }
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Saved {path}")
+    return report
+
+
+# ==========================
+# COMPARISON
+# ==========================
+def baseline_path(name):
+    if os.sep in name or name.endswith('.json'):
+        return name
+    return os.path.join(BENCH_DIR, f"{name}.json")
+
+
+def compare(args):
+    with open(baseline_path(args.baseline)) as f:
+        baseline = json.load(f)["results"]
+    with open(baseline_path(args.current)) as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    print(f"{'benchmark':<28} {'base MB/s':>10} {'now MB/s':>10} {'change':>8} {'peak change':>12}")
+    for key in sorted(set(baseline) & set(current)):
+        before, after = baseline[key], current[key]
+        speed = (after["mb_per_s"] - before["mb_per_s"]) / before["mb_per_s"] * 100
+        memory = ((after["peak_alloc_bytes"] - before["peak_alloc_bytes"]) / before["peak_alloc_bytes"] * 100
+                  if before["peak_alloc_bytes"] else 0)
+        flags = []
+        if speed < -args.threshold:
+            flags.append("SLOWER")
+        if memory > args.threshold:
+            flags.append("MORE MEMORY")
+        if flags:
+            regressions.append(key)
+        print(f"{key:<28} {before['mb_per_s']:>10} {after['mb_per_s']:>10} {speed:>+7.1f}% {memory:>+11.1f}%  {' '.join(flags)}")
+
+    for key in sorted(set(baseline) ^ set(current)):
+        print(f"{key:<28} only in {'baseline' if key in baseline else 'current'}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%")
+        return 1
+    print(f"\nNo regressions above {args.threshold}%")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DLP scanning and encryption benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--sizes", default=",".join(SIZES))
+    run_parser.add_argument("--formats", default=",".join(FORMATS))
+    run_parser.add_argument("--density", default="", help="e.g. card=1,email=2 (items per KB)")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--save", help="baseline name (benchmarks/<name>.json) or path")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import sys
+import argparse
+
+from app import create_app
+from routes.files import blob_store
+
+# Usage:
+#   python blobs.py import           move uploads stored before the blob store into it
+#   python blobs.py gc [--dry-run]   remove blobs no file references any more
+#   python blobs.py stats            blob count, references and bytes saved
+#
+# import is safe to rerun and to run while the app is up: each old file is
+# linked into the store (not encrypted again) and its rows updated in one
+# transaction, and the old file is only removed after that commits. Copies of
+# content the store already has are dropped in favour of the stored blob.
+#
+# gc only touches blobs and files untouched for BLOB_GC_GRACE_MINUTES, so it
+# never races an upload in progress; run it from cron.
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encrypted upload blob store")
+    parser.add_argument("command", choices=["import", "gc", "stats"])
+    parser.add_argument("--dry-run", action="store_true", help="gc: report what would be removed")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "import":
+            totals = blob_store.import_legacy()
+        elif args.command == "gc":
+            totals = blob_store.gc(dry_run=args.dry_run)
+        else:
+            totals = blob_store.stats()
+        for name, value in totals.items():
+            print(f"{name}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,23 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def engine_options(url):
+    # Pool settings for one database URL (primary or replica). pre_ping and
+    # recycle drop connections the server (or a proxy) has closed while idle,
+    # e.g. after MySQL's wait_timeout, instead of failing the next request.
+    options = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+    if not url.startswith("sqlite"):
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        )
+    return options
+
+
 class Config:
     # ==========================
     # DATABASE
@@ -14,6 +31,16 @@ class Config:
     )
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Optional read replica for the admin analytics routes (see
+    # services/replica_service.py); unset, everything uses the primary
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+    SQLALCHEMY_BINDS = {
+        "replica": {"url": DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL)}
+    } if DATABASE_REPLICA_URL else {}
+    # How long a failed replica is skipped before it is tried again
+    REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", "30"))
 
     # ==========================
     # SECURITY KEYS
@@ -27,7 +54,11 @@ class Config:
     # FILE UPLOAD SETTINGS
     # ==========================
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB limit
+    # Scanning streams the document, so this only bounds the request body.
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))  # 16MB default
+    # Queue uploads for background processing by default (per request: ?async=true)
+    UPLOAD_ASYNC = os.getenv("UPLOAD_ASYNC", "false").lower() in ("1", "true", "yes")
+    UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "200"))
 
     # ==========================
     # ENV SETTINGS
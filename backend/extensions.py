@@ -1,12 +1,22 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_bcrypt import Bcrypt
+from services.metrics_service import MetricsService
+from services.response_cache_service import ResponseCacheService
+from services.replica_service import RoutingSession, ReplicaRouter
 
-# Database instance
-db = SQLAlchemy()
+# Database instance (read-only routes may be sent to the replica bind)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+replicas = ReplicaRouter()
 
 # JWT Manager
 jwt = JWTManager()
 
 # Password hashing
-bcrypt = Bcrypt()
\ No newline at end of file
+bcrypt = Bcrypt()
+
+# Prometheus metrics
+metrics = MetricsService()
+
+# Admin analytics responses
+response_cache = ResponseCacheService()
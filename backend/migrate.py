@@ -0,0 +1,224 @@
+import os
+import sys
+import argparse
+import importlib.util
+from datetime import datetime, timedelta
+from sqlalchemy import Table, Column, String, DateTime, MetaData, inspect, select, text, func, or_
+
+from app import create_app
+from extensions import db
+from models import File, Detection, Log, AnomalyLog
+from utils.pagination import DEFAULT_PAGE_SIZE
+
+# Usage:
+#   python migrate.py            apply pending migrations (same as "upgrade")
+#   python migrate.py status     list applied and pending migrations
+#   python migrate.py explain    check that the hot queries use their indexes
+#
+# Migrations live in migrations/vNNN_<name>.py and define `description` and
+# `upgrade(ops)`. Every step goes through MigrationOps, which skips work that
+# is already done, so a database built from schema.sql or the old fix_db.py
+# can be brought under version control by simply running the migrations.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', String(32), primary_key=True),
+    Column('description', String(255)),
+    Column('applied_at', DateTime, default=datetime.utcnow)
+)
+
+
+class MigrationOps:
+    def __init__(self, conn):
+        self.conn = conn
+        self.dialect = conn.dialect.name
+
+    def has_table(self, table):
+        return inspect(self.conn).has_table(table)
+
+    def columns(self, table):
+        return {column['name'] for column in inspect(self.conn).get_columns(table)}
+
+    def indexes(self, table):
+        return {index['name']: index['column_names'] for index in inspect(self.conn).get_indexes(table)}
+
+    def create_table(self, table):
+        if not self.has_table(table.name):
+            print(f"  create table {table.name}")
+            table.create(self.conn)
+
+    def add_column(self, table, column, ddl):
+        if column not in self.columns(table):
+            print(f"  add column {table}.{column}")
+            self.conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+    def drop_column(self, table, column):
+        if column in self.columns(table):
+            print(f"  drop column {table}.{column}")
+            self.conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+    def create_index(self, name, table, columns):
+        # An index with the same columns under another name (e.g. the one MySQL
+        # creates for a foreign key) already serves the same queries.
+        existing = self.indexes(table)
+        if name in existing or list(columns) in existing.values():
+            return
+        print(f"  create index {name} on {table} ({', '.join(columns)})")
+        self.conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+    def execute(self, sql, **params):
+        return self.conn.execute(text(sql), params)
+
+
+def load_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not (filename.startswith('v') and filename.endswith('.py')):
+            continue
+        version = filename[:-3]
+        spec = importlib.util.spec_from_file_location(f"migrations.{version}", os.path.join(MIGRATIONS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append((version, module))
+    return migrations
+
+
+def applied_versions(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return {row.version: row.applied_at for row in conn.execute(select(schema_migrations))}
+
+
+def upgrade():
+    with db.engine.begin() as conn:
+        applied = applied_versions(conn)
+
+    pending = [(version, module) for version, module in load_migrations() if version not in applied]
+    if not pending:
+        print("Schema is up to date.")
+        return
+
+    for version, module in pending:
+        print(f"Applying {version}: {module.description}")
+        # One transaction per migration. MySQL commits DDL implicitly, which is
+        # why every step is written to be safe to re-run after a failure.
+        with db.engine.begin() as conn:
+            module.upgrade(MigrationOps(conn))
+            conn.execute(schema_migrations.insert().values(version=version, description=module.description))
+    print("Schema update complete.")
+
+
+def status():
+    with db.engine.begin() as conn:
+        applied = applied_versions(conn)
+    for version, module in load_migrations():
+        state = f"applied {applied[version]:%Y-%m-%d %H:%M}" if version in applied else "pending"
+        print(f"{version:<32} {state:<24} {module.description}")
+
+
+# ==========================
+# EXPLAIN CHECK
+# ==========================
+def keyset_query(query, time_column, id_column, since):
+    # A page after the first, as utils.pagination.keyset_page builds it
+    return query.filter(time_column.isnot(None), time_column <= since, or_(time_column < since, id_column < 1000)).order_by(
+        time_column.desc(), id_column.desc()).limit(DEFAULT_PAGE_SIZE + 1)
+
+
+def hot_queries():
+    # (name, table, expected index, query) for the queries run per request
+    since = datetime.utcnow() - timedelta(hours=1)
+    return [
+        ("activity counter rebuild", "files", "ix_files_user_time",
+         db.session.query(File.upload_time, File.risk_level).filter(File.user_id == 1, File.upload_time >= since)),
+        ("critical uploads in window", "files", "ix_files_user_risk_time",
+         File.query.filter(File.user_id == 1, File.risk_level == "Critical", File.upload_time >= since)),
+        ("my files page", "files", "ix_files_user_time",
+         keyset_query(File.query.filter_by(user_id=1), File.upload_time, File.id, since)),
+        ("uploads in date range", "files", "ix_files_upload_time",
+         File.query.filter(File.upload_time >= since)),
+        ("recent uploads", "files", "ix_files_upload_time",
+         File.query.order_by(File.upload_time.desc()).limit(10)),
+        ("blob references", "files", "ix_files_content_hash",
+         db.session.query(func.count(File.id)).filter(File.content_hash == "0" * 64)),
+        ("files by detected type", "detections", "ix_detections_type_file",
+         db.session.query(Detection.file_id).filter(Detection.detection_type == "Credit Card")),
+        ("user type breakdown", "detections", "ix_detections_user_type",
+         db.session.query(Detection.detection_type, func.count(Detection.id)).filter(
+             Detection.user_id == 1).group_by(Detection.detection_type)),
+        ("admin logs page", "logs", "ix_logs_timestamp",
+         keyset_query(Log.query, Log.timestamp, Log.id, since)),
+        ("anomalies page", "anomaly_logs", "ix_anomaly_logs_timestamp",
+         keyset_query(AnomalyLog.query, AnomalyLog.timestamp, AnomalyLog.id, since)),
+        ("anomalies in window", "anomaly_logs", "ix_anomaly_logs_timestamp",
+         AnomalyLog.query.filter(AnomalyLog.timestamp >= since)),
+        ("anomalies per user", "anomaly_logs", "ix_anomaly_logs_user_id",
+         AnomalyLog.query.filter_by(user_id=1))
+    ]
+
+
+def explain_rows(conn, query):
+    compiled = query.statement.compile(dialect=conn.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == 'sqlite' else "EXPLAIN "
+    return conn.exec_driver_sql(prefix + str(compiled), params).fetchall()
+
+
+def explain():
+    # MySQL may still prefer a table scan on a tiny table, so an index that is
+    # possible but not chosen is only a warning; an index that cannot be used
+    # at all fails the check.
+    dialect = db.engine.dialect.name
+    if dialect not in ('mysql', 'sqlite'):
+        print(f"EXPLAIN check not supported for {dialect}")
+        return 0
+
+    failures = 0
+    with db.engine.connect() as conn:
+        ops = MigrationOps(conn)
+        for name, table, expected, query in hot_queries():
+            indexes = ops.indexes(table)
+            # Same columns under another name count as the expected index
+            accepted = {expected} | {index for index, columns in indexes.items()
+                                     if columns == indexes.get(expected)}
+            rows = explain_rows(conn, query)
+            if dialect == 'sqlite':
+                plan = " | ".join(row[-1] for row in rows)
+                used = any(f"INDEX {index} " in plan + " " for index in accepted)
+                possible = used
+            else:
+                plan = " | ".join(f"{row._mapping['table']}: key={row._mapping['key']}" for row in rows)
+                used = any(row._mapping['key'] in accepted for row in rows)
+                possible = used or any(set((row._mapping['possible_keys'] or '').split(',')) & accepted for row in rows)
+
+            if used:
+                print(f"OK    {name:<28} {plan}")
+            elif possible:
+                print(f"WARN  {name:<28} {expected} possible but not chosen: {plan}")
+            else:
+                failures += 1
+                print(f"FAIL  {name:<28} {expected} not usable: {plan}")
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Database migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status", "explain"])
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "upgrade":
+            upgrade()
+        elif args.command == "status":
+            status()
+        else:
+            return explain()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+from sqlalchemy import (
+    MetaData, Table, Column, ForeignKey, UniqueConstraint, Integer, String, Text, Boolean, DateTime
+)
+
+description = "Baseline: tables and columns from schema.sql and the old fix_db.py"
+
+# Frozen copy of the tables as of this version. Never build them from the
+# models: later model changes belong in later migrations.
+metadata = MetaData()
+
+users = Table(
+    'users', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(100), unique=True, nullable=False),
+    Column('email', String(100), unique=True, nullable=False),
+    Column('password_hash', String(255), nullable=False),
+    Column('role', String(20)),
+    Column('is_locked', Boolean),
+    Column('profile_photo', String(255), nullable=True),
+    Column('created_at', DateTime)
+)
+
+files = Table(
+    'files', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+    Column('filename', String(255), nullable=False),
+    Column('encrypted_path', String(500), nullable=False),
+    Column('is_blocked', Boolean),
+    Column('detected_types', Text, nullable=True),
+    Column('filesize', Integer, nullable=True),
+    Column('risk_score', Integer),
+    Column('risk_level', String(20)),
+    Column('upload_time', DateTime)
+)
+
+logs = Table(
+    'logs', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+    Column('action', String(255), nullable=False),
+    Column('details', Text, nullable=True),
+    Column('ip_address', String(45)),
+    Column('timestamp', DateTime)
+)
+
+anomaly_logs = Table(
+    'anomaly_logs', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+    Column('anomaly_type', String(100), nullable=False),
+    Column('severity', String(20)),
+    Column('details', Text, nullable=True),
+    Column('timestamp', DateTime)
+)
+
+scan_cache = Table(
+    'scan_cache', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('content_hash', String(64), nullable=False),
+    Column('extractor', String(10), nullable=False),
+    Column('pattern_version', String(16), nullable=False),
+    Column('detected_counts', Text, nullable=False),
+    Column('risk_score', Integer),
+    Column('risk_level', String(20)),
+    Column('hits', Integer),
+    Column('created_at', DateTime),
+    Column('last_used', DateTime, index=True),
+    UniqueConstraint('content_hash', 'extractor', 'pattern_version', name='uq_scan_cache_key')
+)
+
+upload_jobs = Table(
+    'upload_jobs', metadata,
+    Column('id', String(32), primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True),
+    Column('filename', String(255), nullable=False),
+    Column('filesize', Integer, nullable=True),
+    Column('status', String(20)),
+    Column('stage', String(50), nullable=True),
+    Column('progress', Integer),
+    Column('http_status', Integer, nullable=True),
+    Column('result', Text, nullable=True),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime)
+)
+
+
+def upgrade(ops):
+    for table in (users, files, logs, anomaly_logs, scan_cache, upload_jobs):
+        ops.create_table(table)
+
+    # Columns that older databases only got from fix_db.py
+    ops.add_column("users", "is_locked", "BOOLEAN DEFAULT FALSE")
+    ops.add_column("users", "profile_photo", "VARCHAR(255) NULL")
+    ops.add_column("files", "risk_score", "INT DEFAULT 0")
+    ops.add_column("files", "risk_level", "VARCHAR(20) DEFAULT 'Low'")
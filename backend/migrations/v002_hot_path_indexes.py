@@ -0,0 +1,13 @@
+description = "Composite indexes for the per-user, time-range and recent-first queries"
+
+
+def upgrade(ops):
+    # Per-user uploads in a time window and "my files" newest first
+    ops.create_index("ix_files_user_time", "files", ["user_id", "upload_time"])
+    # Lock rule: one user's Critical uploads in the last hour
+    ops.create_index("ix_files_user_risk_time", "files", ["user_id", "risk_level", "upload_time"])
+    # Dashboard date ranges and recent activity
+    ops.create_index("ix_files_upload_time", "files", ["upload_time"])
+    ops.create_index("ix_logs_timestamp", "logs", ["timestamp"])
+    ops.create_index("ix_anomaly_logs_timestamp", "anomaly_logs", ["timestamp"])
+    ops.create_index("ix_anomaly_logs_user_id", "anomaly_logs", ["user_id"])
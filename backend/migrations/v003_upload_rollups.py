@@ -0,0 +1,67 @@
+from sqlalchemy import (
+    MetaData, Table, Column, ForeignKey, UniqueConstraint, Integer, String, Boolean, Date, DateTime, BigInteger
+)
+
+description = "Daily and hourly upload rollups for the admin dashboard"
+
+# Frozen copy of the tables as of this version; `users` is only declared so
+# the foreign keys resolve.
+metadata = MetaData()
+Table('users', metadata, Column('id', Integer, primary_key=True))
+
+
+def rollup_table(name, bucket):
+    return Table(
+        name, metadata,
+        Column('id', Integer, primary_key=True),
+        bucket,
+        Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True),
+        Column('risk_level', String(20), nullable=False),
+        Column('is_blocked', Boolean, nullable=False),
+        Column('uploads', Integer, nullable=False),
+        Column('total_bytes', BigInteger, nullable=False),
+        Column('risk_score_sum', BigInteger, nullable=False),
+        UniqueConstraint(bucket.name, 'user_id', 'risk_level', 'is_blocked', name=f"uq_{name}_key")
+    )
+
+
+upload_rollups_daily = rollup_table('upload_rollups_daily', Column('day', Date, nullable=False))
+upload_rollups_hourly = rollup_table('upload_rollups_hourly', Column('hour', DateTime, nullable=False))
+
+# Bucket expressions per dialect. On SQLite they must produce the strings
+# SQLAlchemy stores for Date and DateTime, or the upload path's upserts would
+# not find the seeded rows. Colons are escaped for text().
+BUCKETS = {
+    'mysql': {
+        'day': "DATE(upload_time)",
+        'hour': r"DATE_FORMAT(upload_time, '%Y-%m-%d %H\:00\:00')"
+    },
+    'sqlite': {
+        'day': "DATE(upload_time)",
+        'hour': r"STRFTIME('%Y-%m-%d %H\:00\:00.000000', upload_time)"
+    }
+}
+
+SEED = """
+INSERT INTO {table} ({bucket}, user_id, risk_level, is_blocked, uploads, total_bytes, risk_score_sum)
+SELECT {expression}, user_id, COALESCE(NULLIF(risk_level, ''), 'Low'), COALESCE(is_blocked, 0),
+       COUNT(*), COALESCE(SUM(filesize), 0), COALESCE(SUM(risk_score), 0)
+FROM files
+WHERE upload_time IS NOT NULL
+GROUP BY {expression}, user_id, COALESCE(NULLIF(risk_level, ''), 'Low'), COALESCE(is_blocked, 0)
+"""
+
+
+def upgrade(ops):
+    created = not ops.has_table(upload_rollups_daily.name)
+    for table in (upload_rollups_daily, upload_rollups_hourly):
+        ops.create_table(table)
+
+    if created:
+        # Seed from the existing files so the dashboard is right straight away;
+        # `python rollups.py backfill` rebuilds them later if ever needed.
+        buckets = BUCKETS.get(ops.dialect, BUCKETS['mysql'])
+        for table, bucket in ((upload_rollups_daily, 'day'), (upload_rollups_hourly, 'hour')):
+            ops.execute(SEED.format(table=table.name, bucket=bucket, expression=buckets[bucket]))
+        files = ops.execute("SELECT COUNT(*) FROM files WHERE upload_time IS NOT NULL").scalar()
+        print(f"  rolled up {files} file(s)")
@@ -0,0 +1,56 @@
+from sqlalchemy import MetaData, Table, Column, ForeignKey, UniqueConstraint, Index, Integer, String
+
+description = "Detections table replacing the comma-separated files.detected_types"
+
+# Frozen copy of the table as of this version; `users` and `files` are only
+# declared so the foreign keys resolve.
+metadata = MetaData()
+Table('users', metadata, Column('id', Integer, primary_key=True))
+Table('files', metadata, Column('id', Integer, primary_key=True))
+
+detections = Table(
+    'detections', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('file_id', Integer, ForeignKey('files.id', ondelete='CASCADE'), nullable=False),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+    Column('detection_type', String(50), nullable=False),
+    Column('count', Integer, nullable=False),
+    UniqueConstraint('file_id', 'detection_type', name='uq_detections_file_type'),
+    Index('ix_detections_type_file', 'detection_type', 'file_id'),
+    Index('ix_detections_user_type', 'user_id', 'detection_type')
+)
+
+BATCH_SIZE = 1000
+
+
+def upgrade(ops):
+    ops.create_table(detections)
+    if "detected_types" not in ops.columns("files"):
+        return
+
+    # Old rows only recorded which types were found, not how often, so each
+    # converted detection gets a count of 1. Read in id order, one batch at a
+    # time; files that already have detections (a rerun) are skipped.
+    converted = last_id = 0
+    while True:
+        batch = ops.execute(
+            "SELECT id, user_id, detected_types FROM files "
+            "WHERE id > :last_id AND detected_types IS NOT NULL AND detected_types <> '' "
+            "AND NOT EXISTS (SELECT 1 FROM detections WHERE detections.file_id = files.id) "
+            "ORDER BY id LIMIT :batch_size",
+            last_id=last_id, batch_size=BATCH_SIZE
+        ).all()
+        if not batch:
+            break
+        rows = []
+        for file_id, user_id, detected_types in batch:
+            labels = dict.fromkeys(label.strip() for label in detected_types.split(","))
+            rows.extend({"file_id": file_id, "user_id": user_id, "detection_type": label, "count": 1}
+                        for label in labels if label)
+        if rows:
+            ops.conn.execute(detections.insert(), rows)
+        converted += len(batch)
+        last_id = batch[-1][0]
+    print(f"  converted detected_types of {converted} file(s)")
+
+    ops.drop_column("files", "detected_types")
@@ -0,0 +1,29 @@
+from sqlalchemy import MetaData, Table, Column, Index, Integer, BigInteger, String, DateTime
+
+description = "Content-addressed blob store for encrypted uploads"
+
+# Frozen copy of the table as of this version
+metadata = MetaData()
+
+blobs = Table(
+    'blobs', metadata,
+    Column('content_hash', String(64), primary_key=True),
+    Column('path', String(500), nullable=False),
+    Column('size', BigInteger, nullable=False),
+    Column('ref_count', Integer, nullable=False),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+    Index('ix_blobs_ref_count_updated', 'ref_count', 'updated_at')
+)
+
+
+def upgrade(ops):
+    ops.create_table(blobs)
+    ops.add_column("files", "content_hash", "VARCHAR(64) NULL")
+    ops.create_index("ix_files_content_hash", "files", ["content_hash"])
+
+    # Moving the existing files means decrypting each one to hash it, so it is
+    # left to `python blobs.py import`, which can run while the app is up.
+    legacy = ops.execute("SELECT COUNT(*) FROM files WHERE content_hash IS NULL").scalar()
+    if legacy:
+        print(f"  {legacy} existing upload(s) to move with `python blobs.py import`")
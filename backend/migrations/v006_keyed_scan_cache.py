@@ -0,0 +1,10 @@
+description = "Drop scan cache rows keyed by plain SHA-256 of the upload"
+
+
+def upgrade(ops):
+    # The cache is now keyed by the keyed content id. The old keys let anyone
+    # reading the table confirm a known document had been uploaded, and can
+    # never be hit again.
+    dropped = ops.execute("DELETE FROM scan_cache").rowcount
+    if dropped:
+        print(f"  dropped {dropped} scan cache row(s)")
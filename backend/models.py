@@ -31,6 +31,12 @@ class User(db.Model):
 # ==========================
 class File(db.Model):
     __tablename__ = 'files'
+    __table_args__ = (
+        db.Index('ix_files_user_time', 'user_id', 'upload_time'),
+        db.Index('ix_files_user_risk_time', 'user_id', 'risk_level', 'upload_time'),
+        db.Index('ix_files_upload_time', 'upload_time'),
+        db.Index('ix_files_content_hash', 'content_hash'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
@@ -41,21 +47,82 @@ class File(db.Model):
 
     filename = db.Column(db.String(255), nullable=False)
     encrypted_path = db.Column(db.String(500), nullable=False)
+    # Blob holding the encrypted content (encrypted_path is that blob's path);
+    # NULL for uploads not yet moved into the store by `python blobs.py import`
+    content_hash = db.Column(db.String(64), nullable=True)
 
     is_blocked = db.Column(db.Boolean, default=False)
-    detected_types = db.Column(db.Text, nullable=True)
     filesize = db.Column(db.Integer, nullable=True)
     risk_score = db.Column(db.Integer, default=0)
     risk_level = db.Column(db.String(20), default='Low')
 
     upload_time = db.Column(db.DateTime, default=datetime.utcnow)
 
+    detections = db.relationship('Detection', backref='file', order_by='Detection.id',
+                                 cascade='all, delete-orphan', passive_deletes=True)
+
+    @property
+    def detected_types(self):
+        # Comma-joined labels, the shape the API has always returned
+        return ",".join(d.detection_type for d in self.detections) or None
+
+
+# ==========================
+# BLOB MODEL
+# ==========================
+# One encrypted copy per distinct content, shared by every File with the
+# same content_hash (services/blob_store_service.py). ref_count counts those
+# files; updated_at is the last time a reference was added.
+class Blob(db.Model):
+    __tablename__ = 'blobs'
+    __table_args__ = (
+        db.Index('ix_blobs_ref_count_updated', 'ref_count', 'updated_at'),
+    )
+
+    content_hash = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False, default=0)  # plaintext bytes
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ==========================
+# DETECTION MODEL
+# ==========================
+# One row per sensitive-data type found in a file, with how many matches.
+class Detection(db.Model):
+    __tablename__ = 'detections'
+    __table_args__ = (
+        db.UniqueConstraint('file_id', 'detection_type', name='uq_detections_file_type'),
+        db.Index('ix_detections_type_file', 'detection_type', 'file_id'),
+        db.Index('ix_detections_user_type', 'user_id', 'detection_type'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_id = db.Column(
+        db.Integer,
+        db.ForeignKey('files.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    # Copied from the file so per-user breakdowns never touch the files table
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        nullable=False
+    )
+    detection_type = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=1)
+
 
 # ==========================
 # ACTIVITY LOG MODEL
 # ==========================
 class Log(db.Model):
     __tablename__ = 'logs'
+    __table_args__ = (
+        db.Index('ix_logs_timestamp', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
@@ -75,6 +142,10 @@ class Log(db.Model):
 # ==========================
 class AnomalyLog(db.Model):
     __tablename__ = 'anomaly_logs'
+    __table_args__ = (
+        db.Index('ix_anomaly_logs_timestamp', 'timestamp'),
+        db.Index('ix_anomaly_logs_user_id', 'user_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
@@ -91,4 +162,103 @@ class AnomalyLog(db.Model):
     )
 
     details = db.Column(db.Text, nullable=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ==========================
+# SCAN RESULT CACHE MODEL
+# ==========================
+class ScanCache(db.Model):
+    __tablename__ = 'scan_cache'
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'extractor', 'pattern_version', name='uq_scan_cache_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)  # EncryptionService.content_id of the uploaded bytes
+    extractor = db.Column(db.String(10), nullable=False)  # same bytes scan differently as .txt/.pdf/.docx
+    pattern_version = db.Column(db.String(16), nullable=False)
+
+    detected_counts = db.Column(db.Text, nullable=False)  # JSON object
+    risk_score = db.Column(db.Integer, default=0)
+    risk_level = db.Column(db.String(20), default='Low')
+
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+# ==========================
+# UPLOAD JOB MODEL
+# ==========================
+class UploadJob(db.Model):
+    __tablename__ = 'upload_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True
+    )
+
+    filename = db.Column(db.String(255), nullable=False)
+    filesize = db.Column(db.Integer, nullable=True)
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed
+    stage = db.Column(db.String(50), nullable=True)
+    progress = db.Column(db.Integer, default=0)
+    http_status = db.Column(db.Integer, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON body of the finished upload
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ==========================
+# UPLOAD ROLLUP MODELS
+# ==========================
+# Upload counts pre-aggregated per bucket, user, risk level and blocked flag,
+# updated in the same transaction as the File rows they summarise.
+class DailyUploadRollup(db.Model):
+    __tablename__ = 'upload_rollups_daily'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'risk_level', 'is_blocked', name='uq_upload_rollups_daily_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True
+    )
+    risk_level = db.Column(db.String(20), nullable=False)
+    is_blocked = db.Column(db.Boolean, nullable=False)
+
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    total_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    risk_score_sum = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class HourlyUploadRollup(db.Model):
+    __tablename__ = 'upload_rollups_hourly'
+    __table_args__ = (
+        db.UniqueConstraint('hour', 'user_id', 'risk_level', 'is_blocked', name='uq_upload_rollups_hourly_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    hour = db.Column(db.DateTime, nullable=False)  # UTC, truncated to the hour
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey('users.id', ondelete='CASCADE'),
+        nullable=False,
+        index=True
+    )
+    risk_level = db.Column(db.String(20), nullable=False)
+    is_blocked = db.Column(db.Boolean, nullable=False)
+
+    uploads = db.Column(db.Integer, nullable=False, default=0)
+    total_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    risk_score_sum = db.Column(db.BigInteger, nullable=False, default=0)
+
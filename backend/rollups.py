@@ -0,0 +1,38 @@
+import sys
+import argparse
+from datetime import datetime
+
+from app import create_app
+from services.rollup_service import RollupService
+
+# Usage:
+#   python rollups.py backfill                         rebuild every day from the first upload
+#   python rollups.py backfill --since 2024-01-01 --until 2024-01-31
+#
+# The upload path keeps the rollups current on its own; a backfill is only
+# needed after editing files by hand or restoring a dump without the rollup
+# tables. Each day is rebuilt in its own transaction, so uploads landing on a
+# day while it is being rebuilt can be lost from that day's totals. Backfill
+# today's date only while uploads are paused.
+
+
+def parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload rollups for the admin dashboard")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--since", type=parse_day, help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--until", type=parse_day, help="last day to rebuild (default: today, UTC)")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        total = RollupService().backfill(since=args.since, until=args.until)
+        print(f"Rolled up {total} file(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,57 @@
-from flask import Blueprint, jsonify, send_file, request
-from models import db, User, File, Log, AnomalyLog
+from flask import Blueprint, jsonify, send_file, request, Response, stream_with_context
+from flask_jwt_extended import get_jwt_identity
+from extensions import response_cache, replicas
+from models import db, User, File, Detection, Log, AnomalyLog, DailyUploadRollup, HourlyUploadRollup
 from utils.decorators import admin_required
-from sqlalchemy import func
+from utils.pagination import keyset_page, page_limit
+from services.export_service import ExportService, EXPORTS, FORMATS
+from services.audit_service import audit
+from sqlalchemy import func, case
 from datetime import datetime, timedelta
 from io import BytesIO
 
 admin_bp = Blueprint('admin', __name__)
+export_service = ExportService()
+
+# Upload counts come from the rollup tables (services/rollup_service.py), so
+# these endpoints read a few rows per day instead of every file.
+HIGH_RISK_LEVELS = ['High', 'Critical']
+
+
+def rollup_totals(query):
+    # -> (uploads, blocked, high/critical) over the rollup rows matched by query
+    total, blocked, high_risk = query.with_entities(
+        func.coalesce(func.sum(DailyUploadRollup.uploads), 0),
+        func.coalesce(func.sum(case((DailyUploadRollup.is_blocked == True, DailyUploadRollup.uploads), else_=0)), 0),
+        func.coalesce(func.sum(case((DailyUploadRollup.risk_level.in_(HIGH_RISK_LEVELS), DailyUploadRollup.uploads), else_=0)), 0)
+    ).one()
+    return int(total), int(blocked), int(high_risk)
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
 
 @admin_bp.route('/stats', methods=['GET'])
 @admin_required
+@response_cache.cached()
+@replicas.read_only
 def get_stats():
     try:
         total_users = User.query.count()
-        total_files = File.query.count()
-        blocked_files = File.query.filter_by(is_blocked=True).count()
+        total_files, blocked_files, _ = rollup_totals(DailyUploadRollup.query)
         
         # Uploads per day
         daily_uploads = db.session.query(
-            func.date(File.upload_time).label('date'),
-            func.count(File.id).label('count')
-        ).group_by('date').all()
+            DailyUploadRollup.day.label('date'),
+            func.sum(DailyUploadRollup.uploads).label('count')
+        ).group_by(DailyUploadRollup.day).order_by(DailyUploadRollup.day).all()
         
-        # Sensitive types distribution
-        all_files = File.query.filter(File.detected_types != None).all()
-        type_counts = {}
-        for f in all_files:
-            for t in f.detected_types.split(','):
-                type_counts[t] = type_counts.get(t, 0) + 1
+        # Sensitive types distribution (files per type, and total matches)
+        type_counts = db.session.query(
+            Detection.detection_type,
+            func.count(Detection.id),
+            func.sum(Detection.count)
+        ).group_by(Detection.detection_type).order_by(func.count(Detection.id).desc()).all()
 
         return jsonify({
             "success": True,
@@ -34,8 +59,8 @@ def get_stats():
                 "total_users": total_users,
                 "total_files": total_files,
                 "blocked_files": blocked_files,
-                "daily_uploads": [{"date": str(d.date), "count": d.count} for d in daily_uploads],
-                "type_distribution": [{"type": k, "value": v} for k, v in type_counts.items()]
+                "daily_uploads": [{"date": str(d.date), "count": int(d.count)} for d in daily_uploads],
+                "type_distribution": [{"type": t, "value": files, "matches": int(matches)} for t, files, matches in type_counts]
             }
         }), 200
     except Exception as e:
@@ -43,6 +68,8 @@ def get_stats():
 
 @admin_bp.route('/dashboard-stats', methods=['GET'])
 @admin_required
+@response_cache.cached(params=('date_from', 'date_to', 'risk', 'blocked'))
+@replicas.read_only
 def get_dashboard_stats():
     try:
         # Filter parameters
@@ -53,60 +80,63 @@ def get_dashboard_stats():
 
         # Base query for stats calculation
         file_query = File.query
+        rollup_query = DailyUploadRollup.query
         anomaly_query = AnomalyLog.query
         
         if date_from:
             from_dt = datetime.strptime(date_from, '%Y-%m-%d')
             file_query = file_query.filter(File.upload_time >= from_dt)
+            rollup_query = rollup_query.filter(DailyUploadRollup.day >= from_dt.date())
             anomaly_query = anomaly_query.filter(AnomalyLog.timestamp >= from_dt)
         if date_to:
             to_dt = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1)
             file_query = file_query.filter(File.upload_time < to_dt)
+            rollup_query = rollup_query.filter(DailyUploadRollup.day < to_dt.date())
             anomaly_query = anomaly_query.filter(AnomalyLog.timestamp < to_dt)
         if risk:
             file_query = file_query.filter(File.risk_level == risk)
+            rollup_query = rollup_query.filter(DailyUploadRollup.risk_level == risk)
         if blocked:
             file_query = file_query.filter(File.is_blocked == (blocked.lower() == 'true'))
+            rollup_query = rollup_query.filter(DailyUploadRollup.is_blocked == (blocked.lower() == 'true'))
 
         total_users = User.query.count()
-        total_files = file_query.count()
-        blocked_files = file_query.filter_by(is_blocked=True).count()
+        total_files, blocked_files, high_risk_files = rollup_totals(rollup_query)
         safe_files = total_files - blocked_files
         
-        high_risk_files = file_query.filter(File.risk_level.in_(['High', 'Critical'])).count()
-        
-        # Trends (Last 7 Days - always dynamic or fixed?)
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
+        # Trends (Last 7 Days, to the hour)
+        now = datetime.utcnow()
         daily_uploads = db.session.query(
-            func.date(File.upload_time).label('date'),
-            func.count(File.id).label('count')
-        ).filter(File.upload_time >= seven_days_ago).group_by('date').all()
+            func.date(HourlyUploadRollup.hour).label('date'),
+            func.sum(HourlyUploadRollup.uploads).label('count')
+        ).filter(HourlyUploadRollup.hour >= hour_of(now - timedelta(days=7))).group_by('date').order_by('date').all()
+
+        hourly_uploads = db.session.query(
+            HourlyUploadRollup.hour,
+            func.sum(HourlyUploadRollup.uploads).label('count')
+        ).filter(HourlyUploadRollup.hour >= hour_of(now - timedelta(hours=23))).group_by(
+            HourlyUploadRollup.hour
+        ).order_by(HourlyUploadRollup.hour).all()
         
         # Anomalies
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
+        one_hour_ago = now - timedelta(hours=1)
         active_anomalies = AnomalyLog.query.filter(AnomalyLog.timestamp >= one_hour_ago).count()
-        anomalies_24h = AnomalyLog.query.filter(AnomalyLog.timestamp >= (datetime.utcnow() - timedelta(days=1))).count()
+        anomalies_24h = AnomalyLog.query.filter(AnomalyLog.timestamp >= (now - timedelta(days=1))).count()
         
-        # Risk distribution
-        risk_dist = db.session.query(
-            File.risk_level, 
-            func.count(File.id)
-        ).filter(File.user_id.in_(db.session.query(User.id))).group_by(File.risk_level).all()
-        # Note: filtered risk_dist doesn't make sense if we filter global stats, 
-        # but let's keep it consistent with the overall query if parameters provided
-        if risk or blocked or date_from or date_to:
-             risk_dist = db.session.query(
-                File.risk_level, 
-                func.count(File.id)
-            ).filter(File.id.in_(db.session.query(file_query.with_entities(File.id)))).group_by(File.risk_level).all()
+        # Risk distribution (follows the filters when any are given)
+        risk_dist = rollup_query.with_entities(
+            DailyUploadRollup.risk_level,
+            func.sum(DailyUploadRollup.uploads)
+        ).group_by(DailyUploadRollup.risk_level).all()
 
         # Top 5 Risky Users
+        avg_risk = func.sum(DailyUploadRollup.risk_score_sum) * 1.0 / func.sum(DailyUploadRollup.uploads)
         top_risky_users = db.session.query(
             User.username,
-            func.count(File.id).label('total_uploads'),
-            func.avg(File.risk_score).label('avg_risk'),
+            func.sum(DailyUploadRollup.uploads).label('total_uploads'),
+            avg_risk.label('avg_risk'),
             User.role
-        ).join(File).group_by(User.id).order_by(func.avg(File.risk_score).desc()).limit(5).all()
+        ).join(DailyUploadRollup, DailyUploadRollup.user_id == User.id).group_by(User.id).order_by(avg_risk.desc()).limit(5).all()
 
         # Recent Security Activity (Last 10 Uploads)
         recent_uploads = file_query.order_by(File.upload_time.desc()).limit(10).all()
@@ -121,11 +151,12 @@ def get_dashboard_stats():
                 "high_risk_files_count": high_risk_files,
                 "active_anomalies": active_anomalies,
                 "anomalies_last_24h": anomalies_24h,
-                "uploads_last_7_days": [{"date": str(d.date), "count": d.count} for d in daily_uploads],
-                "risk_distribution": [{"level": r[0], "count": r[1]} for r in risk_dist],
+                "uploads_last_7_days": [{"date": str(d.date), "count": int(d.count)} for d in daily_uploads],
+                "uploads_last_24_hours": [{"hour": h.hour.isoformat(), "count": int(h.count)} for h in hourly_uploads],
+                "risk_distribution": [{"level": r[0], "count": int(r[1])} for r in risk_dist],
                 "top_risky_users": [{
                     "username": u[0],
-                    "total_uploads": u[1],
+                    "total_uploads": int(u[1]),
                     "avg_risk": round(float(u[2]), 1),
                     "role": u[3]
                 } for u in top_risky_users],
@@ -140,13 +171,55 @@ def get_dashboard_stats():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+@admin_bp.route('/detections', methods=['GET'])
+@admin_required
+def get_detection_breakdown():
+    # Per-user breakdown of detected types, optionally for one user or type
+    try:
+        user_id = request.args.get('user_id', type=int)
+        detection_type = request.args.get('type')
+
+        query = db.session.query(
+            Detection.user_id,
+            Detection.detection_type,
+            func.count(Detection.id).label('files'),
+            func.sum(Detection.count).label('matches')
+        )
+        if user_id:
+            query = query.filter(Detection.user_id == user_id)
+        if detection_type:
+            query = query.filter(Detection.detection_type == detection_type)
+        breakdown = query.group_by(Detection.user_id, Detection.detection_type).subquery()
+
+        rows = db.session.query(
+            User.id, User.username, breakdown.c.detection_type, breakdown.c.files, breakdown.c.matches
+        ).join(breakdown, breakdown.c.user_id == User.id).order_by(User.username, breakdown.c.files.desc()).all()
+
+        return jsonify({
+            "success": True,
+            "data": [{
+                "user_id": r[0],
+                "username": r[1],
+                "type": r[2],
+                "files": r[3],
+                "matches": int(r[4])
+            } for r in rows]
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @admin_bp.route('/logs', methods=['GET'])
 @admin_required
+@replicas.read_only
 def get_all_logs():
     try:
-        logs = Log.query.order_by(Log.timestamp.desc()).limit(100).all()
+        logs, next_cursor = keyset_page(
+            Log.query, Log.timestamp, Log.id,
+            request.args.get('cursor'), page_limit(request.args.get('limit'), default=100)
+        )
         return jsonify({
             "success": True,
+            "next_cursor": next_cursor,
             "data": [{
                 "id": l.id,
                 "user_id": l.user_id,
@@ -156,16 +229,23 @@ def get_all_logs():
                 "timestamp": l.timestamp.isoformat()
             } for l in logs]
         }), 200
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 @admin_bp.route('/anomalies', methods=['GET'])
 @admin_required
+@replicas.read_only
 def get_anomalies():
     try:
-        anomalies = AnomalyLog.query.order_by(AnomalyLog.timestamp.desc()).all()
+        anomalies, next_cursor = keyset_page(
+            AnomalyLog.query, AnomalyLog.timestamp, AnomalyLog.id,
+            request.args.get('cursor'), page_limit(request.args.get('limit'))
+        )
         return jsonify({
             "success": True,
+            "next_cursor": next_cursor,
             "data": [{
                 "id": a.id,
                 "user_id": a.user_id,
@@ -175,6 +255,87 @@ def get_anomalies():
                 "timestamp": a.timestamp.isoformat()
             } for a in anomalies]
         }), 200
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@admin_bp.route('/scan-cache', methods=['GET'])
+@admin_required
+def get_scan_cache_stats():
+    try:
+        from routes.files import scan_cache
+        return jsonify({"success": True, "data": scan_cache.stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@admin_bp.route('/blob-store', methods=['GET'])
+@admin_required
+def get_blob_store_stats():
+    try:
+        from routes.files import blob_store
+        return jsonify({"success": True, "data": blob_store.stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@admin_bp.route('/response-cache', methods=['GET'])
+@admin_required
+def get_response_cache_stats():
+    try:
+        return jsonify({"success": True, "data": response_cache.stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@admin_bp.route('/audit-stats', methods=['GET'])
+@admin_required
+def get_audit_stats():
+    try:
+        return jsonify({"success": True, "data": audit.stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@admin_bp.route('/scan-stats', methods=['GET'])
+@admin_required
+def get_scan_stats():
+    try:
+        from routes.files import dlp_engine
+        return jsonify({"success": True, "data": dlp_engine.stage_stats()}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@admin_bp.route('/export/<name>', methods=['GET'])
+@admin_required
+def export_table(name):
+    # Full streaming export: ?format=csv|ndjson&date_from=&date_to=&gzip=true
+    try:
+        fmt = request.args.get('format', 'csv').lower()
+        compress = request.args.get('gzip', '').lower() == 'true'
+        if name not in EXPORTS:
+            return jsonify({"success": False, "message": f"Unknown export '{name}' ({', '.join(EXPORTS)})"}), 404
+        if fmt not in FORMATS:
+            return jsonify({"success": False, "message": f"Unknown format '{fmt}' ({', '.join(FORMATS)})"}), 400
+
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        try:
+            start = datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+            end = datetime.strptime(date_to, '%Y-%m-%d') + timedelta(days=1) if date_to else None
+        except ValueError:
+            return jsonify({"success": False, "message": "Dates must be YYYY-MM-DD"}), 400
+
+        audit.log(
+            int(get_jwt_identity()),
+            "Data Export",
+            f"Export: {name}, Format: {fmt}, From: {date_from or '-'}, To: {date_to or '-'}",
+            request.remote_addr
+        )
+
+        filename = f"dlp_{name}.{fmt}" + (".gz" if compress else "")
+        return Response(
+            stream_with_context(export_service.encode(name, fmt, start, end, compress)),
+            mimetype='application/gzip' if compress else FORMATS[fmt],
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
@@ -185,14 +346,15 @@ def export_report():
         from reportlab.lib.pagesizes import letter
         from reportlab.pdfgen import canvas
         
-        total_files = File.query.count()
-        blocked_files = File.query.filter_by(is_blocked=True).count()
-        high_risk_files = File.query.filter(File.risk_level.in_(['High', 'Critical'])).count()
+        total_files, blocked_files, high_risk_files = rollup_totals(DailyUploadRollup.query)
         
+        violations = func.sum(DailyUploadRollup.uploads)
         top_risky_users = db.session.query(
             User.username, 
-            func.count(File.id)
-        ).join(File).filter(File.risk_level.in_(['High', 'Critical'])).group_by(User.username).order_by(func.count(File.id).desc()).limit(5).all()
+            violations
+        ).join(DailyUploadRollup, DailyUploadRollup.user_id == User.id).filter(
+            DailyUploadRollup.risk_level.in_(HIGH_RISK_LEVELS)
+        ).group_by(User.username).order_by(violations.desc()).limit(5).all()
 
         buffer = BytesIO()
         p = canvas.Canvas(buffer, pagesize=letter)
@@ -1,14 +1,49 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from models import db, User, Log
-from extensions import bcrypt
-from datetime import timedelta
+from models import db, User
+from extensions import response_cache
 from sqlalchemy import or_
 from werkzeug.utils import secure_filename
+from services.revocation_service import RevocationService
+from services.password_service import PasswordService, PasswordPoolBusy
+from services.login_throttle_service import LoginThrottleService
+from services.anomaly_service import AnomalyService
+from services.audit_service import audit
 import datetime
 import os
 
 auth_bp = Blueprint("auth", __name__)
+revocations = RevocationService()
+passwords = PasswordService()
+login_throttle = LoginThrottleService()
+anomaly_service = AnomalyService()
+
+
+def issue_token(user):
+    return create_access_token(
+        identity=str(user.id),
+        additional_claims=revocations.claims(user),
+        expires_delta=revocations.lifetime
+    )
+
+def record_failed_login(user, ip_address, identifier):
+    ip_failures, identifier_failures = login_throttle.record_failure(ip_address, identifier)
+
+    # Recorded once per lockout, on the attempt that reaches the anomaly
+    # threshold or the throttle limit, whichever is lower: a lower limit
+    # throttles the identifier before the threshold could ever be reached.
+    trigger = min(anomaly_service.THRESHOLDS['failed_logins'], login_throttle.max_identifier_failures)
+    if user and identifier_failures == trigger:
+        anomaly = anomaly_service.check_login_anomaly(user.id, identifier_failures, trigger)
+        audit.anomaly(user.id, anomaly['type'], anomaly['severity'],
+                      f"{anomaly['details']} Last attempt from {ip_address}.")
+    if ip_failures == login_throttle.max_ip_failures:
+        audit.log(
+            user.id if user else None,
+            "Login Throttled",
+            f"{ip_failures} failed login attempts from {ip_address} in {login_throttle.window_minutes} minutes",
+            ip_address
+        )
 
 @auth_bp.route("/register", methods=["POST"])
 def register():
@@ -40,7 +75,7 @@ def register():
             return jsonify({"success": False, "message": "Username or Email already exists"}), 400
 
         # Hash password
-        hashed_password = bcrypt.generate_password_hash(password).decode("utf-8")
+        hashed_password = passwords.generate(password)
 
         new_user = User(
             username=username,
@@ -51,6 +86,7 @@ def register():
 
         db.session.add(new_user)
         db.session.commit()
+        response_cache.invalidate()  # user counts on the admin dashboard
 
         return jsonify({
             "success": True,
@@ -58,6 +94,8 @@ def register():
             "data": {"username": username, "role": role}
         }), 201
 
+    except PasswordPoolBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({"success": False, "message": "Registration failed", "error": str(e)}), 500
@@ -77,15 +115,25 @@ def login():
 
         identifier = identifier.strip()
         password = password.strip()
+        ip_address = request.remote_addr
+
+        # Throttle before any lookup or bcrypt work
+        if login_throttle.is_blocked(ip_address, identifier):
+            response = jsonify({"success": False, "message": "Too many failed login attempts. Try again later."})
+            response.headers["Retry-After"] = str(login_throttle.retry_after())
+            return response, 429
 
         # Find user by email OR username
         user = User.query.filter(
             or_(User.email == identifier, User.username == identifier)
         ).first()
 
-        if not user or not bcrypt.check_password_hash(user.password_hash, password):
+        if not user or not passwords.check(user.password_hash, password):
+            record_failed_login(user, ip_address, identifier)
             return jsonify({"success": False, "message": "Invalid email or password"}), 401
 
+        login_throttle.reset(identifier)
+
         # Check if user is locked
         if user.is_locked:
             return jsonify({
@@ -93,22 +141,11 @@ def login():
                 "message": "Account temporarily locked due to repeated high-risk uploads."
             }), 403
 
-        # Identity MUST be a string for JWT
-        access_token = create_access_token(
-            identity=str(user.id),
-            expires_delta=timedelta(days=1)
-        )
+        # Identity MUST be a string for JWT; role and lock state ride along as claims
+        access_token = issue_token(user)
 
         # Log login activity
-        login_log = Log(
-            user_id=user.id,
-            action="Login",
-            details="User logged in successfully",
-            ip_address=request.remote_addr
-        )
-
-        db.session.add(login_log)
-        db.session.commit()
+        audit.log(user.id, "Login", "User logged in successfully", ip_address)
 
         return jsonify({
             "success": True,
@@ -123,6 +160,8 @@ def login():
             }
         }), 200
 
+    except PasswordPoolBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
     except Exception as e:
         return jsonify({"success": False, "message": "Login failed", "error": str(e)}), 500
 
@@ -166,13 +205,22 @@ def change_password():
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
 
-        if not user or not bcrypt.check_password_hash(user.password_hash, current_password):
+        if not user or not passwords.check(user.password_hash, current_password):
             return jsonify({"success": False, "message": "Invalid current password"}), 401
 
-        user.password_hash = bcrypt.generate_password_hash(new_password).decode("utf-8")
+        user.password_hash = passwords.generate(new_password)
         db.session.commit()
 
-        return jsonify({"success": True, "message": "Password updated successfully"}), 200
+        # Sign out every other session; this one continues with a fresh token
+        revocations.revoke(user.id)
+
+        return jsonify({
+            "success": True,
+            "message": "Password updated successfully",
+            "data": {"access_token": issue_token(user)}
+        }), 200
+    except PasswordPoolBusy as e:
+        return jsonify({"success": False, "message": str(e)}), 503
     except Exception as e:
         return jsonify({"success": False, "message": "Failed to change password", "error": str(e)}), 500
 
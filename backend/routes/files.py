@@ -1,12 +1,24 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from extensions import db
-from models import User, File, Log, AnomalyLog
-from services.dlp_engine import DLPEngine
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from extensions import db, metrics, response_cache
+from models import User, File, Detection, UploadJob
+from services.dlp_engine import DLPEngine, new_scan_stats
 from services.encryption_service import EncryptionService
 from services.anomaly_service import AnomalyService
+from services.scan_cache_service import ScanCacheService
+from services.job_service import JobService
+from services.activity_counter_service import ActivityCounterService
+from services.rollup_service import RollupService
+from services.blob_store_service import BlobStoreService
+from routes.auth import revocations
+from services.audit_service import audit
 import os
+import uuid
+import time
 from werkzeug.utils import secure_filename
+from sqlalchemy import update
+from sqlalchemy.orm import selectinload
+from utils.pagination import keyset_page, page_limit
 import io
 from datetime import datetime, timedelta
 
@@ -14,6 +26,293 @@ files_bp = Blueprint('files', __name__)
 dlp_engine = DLPEngine()
 encryption_service = EncryptionService()
 anomaly_service = AnomalyService()
+scan_cache = ScanCacheService(dlp_engine.pattern_version)
+upload_jobs = JobService()
+upload_counters = ActivityCounterService()
+rollups = RollupService()
+blob_store = BlobStoreService(encryption_service)
+
+
+LOCKED_MESSAGE = "Account temporarily locked due to repeated high-risk uploads."
+
+
+def scan_uploads(documents):
+    # documents: [(filename, file_content)] -> one scan result per document.
+    # Cached results are looked up in one go; the rest are scanned together.
+    keys = [(encryption_service.content_id(file_content), dlp_engine.extractor_for(filename))
+            for filename, file_content in documents]
+    with metrics.stage("scan_cache_lookup"):
+        cached = scan_cache.get_many(keys)
+
+    first_index = {}
+    for i, key in enumerate(keys):
+        if key not in cached:
+            first_index.setdefault(key, i)
+    to_scan = list(first_index.values())
+    if to_scan:
+        stats = new_scan_stats()
+        started = time.perf_counter()
+        scanned = dlp_engine.scan_many([(documents[i][1], documents[i][0]) for i in to_scan], stats)
+        metrics.observe_scan(time.perf_counter() - started, stats)
+    else:
+        scanned = []
+
+    for i, (detected_counts, extraction_errors) in zip(to_scan, scanned):
+        filename = documents[i][0]
+        incomplete = dlp_engine.is_incomplete(extraction_errors)
+        total_risk_score, risk_level = dlp_engine.score(detected_counts, incomplete)
+        result = {
+            'detected_counts': detected_counts,
+            'risk_score': total_risk_score,
+            'risk_level': risk_level,
+            'scan_complete': not incomplete,
+            'skipped_pages': extraction_errors
+        }
+        if incomplete:
+            current_app.logger.warning(f"Scan incomplete for {filename}, risk raised to {risk_level}")
+        elif extraction_errors:
+            current_app.logger.warning(f"Skipped {len(extraction_errors)} unreadable page(s) in {filename}")
+        else:
+            # Partial extractions are not cached so a retry gets a full scan
+            scan_cache.put(keys[i][0], keys[i][1], detected_counts, total_risk_score, risk_level)
+        cached[keys[i]] = result
+
+    return [dict(cached[key],
+                 scan_complete=cached[key].get('scan_complete', True),
+                 skipped_pages=cached[key].get('skipped_pages', [])) for key in keys]
+
+
+def upload_record(user_id, filename, blob, file_size, scan):
+    content_hash, encrypted_path = blob
+    return File(
+        user_id=user_id,
+        filename=filename,
+        encrypted_path=encrypted_path,
+        content_hash=content_hash,
+        is_blocked=len(scan['detected_counts']) > 0 or not scan['scan_complete'],
+        # Inserted in one batch per flush, after the file rows
+        detections=[Detection(user_id=user_id, detection_type=label, count=count)
+                    for label, count in scan['detected_counts'].items()],
+        filesize=file_size,
+        risk_score=scan['risk_score'],
+        risk_level=scan['risk_level'],
+        upload_time=datetime.utcnow()  # needed by the rollups before the INSERT
+    )
+
+
+def audit_upload(user_id, filename, scan, ip_address, anomalies):
+    # Called once the upload is committed; written by the audit writer
+    audit.log(
+        user_id,
+        "File Upload",
+        f"File: {filename}, Risk: {scan['risk_level']} ({scan['risk_score']})"
+        + ("" if scan['scan_complete'] else ", Scan incomplete"),
+        ip_address
+    )
+    for anomaly in anomalies:
+        audit.anomaly(user_id, anomaly.get('type'), anomaly.get('severity', 'Medium'), anomaly.get('details'))
+
+
+def audit_lock(user_id, ip_address):
+    # Part of the locking transaction, so the lock is never left unexplained
+    audit.log(user_id, "Account Locked", "User locked due to 3+ Critical uploads in 1 hour.", ip_address, sync=True)
+
+
+def upload_result(scan):
+    return {
+        "risk_score": scan['risk_score'],
+        "risk_level": scan['risk_level'],
+        "is_blocked": len(scan['detected_counts']) > 0 or not scan['scan_complete'],
+        "scan_complete": scan['scan_complete'],
+        "skipped_pages": scan['skipped_pages']
+    }
+
+
+def lock_user(user_id, ip_address):
+    # Part of the caller's transaction; no user row is loaded
+    db.session.execute(update(User).where(User.id == user_id).values(is_locked=True))
+    audit_lock(user_id, ip_address)
+
+
+def process_upload(user_id, filename, file_content, ip_address, locked=False, progress=None):
+    # Full DLP pipeline for one file. Returns (response body, status code) so it
+    # can serve both the synchronous endpoint and background upload jobs.
+    # `locked` is the lock state from the uploader's token.
+    written_paths = []
+
+    def report(stage, percent):
+        # Job progress is written on its own connection, so this session must
+        # not hold write locks at that point. Only standalone rows (the scan
+        # cache) are pending when it is called; commit them first.
+        if progress is not None:
+            db.session.commit()
+            progress(stage, percent)
+
+    try:
+        if locked:
+            return {"success": False, "message": LOCKED_MESSAGE}, 403
+
+        file_size = len(file_content)
+        metrics.upload_size.observe(file_size)
+
+        # 1. DLP Scanning & Risk Scoring (reused when the same bytes were scanned before)
+        report("scanning", 20)
+        scan = scan_uploads([(filename, file_content)])[0]
+
+        # 2. Anomaly Detection & Locking Logic
+        report("anomaly_checks", 50)
+        with metrics.stage("lock_rule_query"):
+            recent_uploads_count, critical_uploads_count = upload_counters.recent(user_id)
+        
+        if scan['risk_level'] == "Critical":
+            if critical_uploads_count >= 2: # This is the 3rd one
+                lock_user(user_id, ip_address)
+                db.session.commit()
+                revocations.revoke(user_id)
+                response_cache.invalidate()
+                return {"success": False, "message": LOCKED_MESSAGE}, 403
+
+        with metrics.stage("anomaly_checks"):
+            anomalies = anomaly_service.check_upload_anomaly(user_id, file_size, recent_uploads_count)
+
+        # 3. Encryption and Storage (content already in the blob store is only referenced)
+        # No progress is reported from here on: the blob reference and the
+        # file row are one transaction, and the job finishes right after it.
+        report("encrypting", 75)
+        with metrics.stage("encryption"):
+            blob = blob_store.put(file_content, written_paths)
+
+        # 4. Save to DB
+        with metrics.stage("commit"):
+            record = upload_record(user_id, filename, blob, file_size, scan)
+            db.session.add(record)
+            rollups.record([record])
+            db.session.commit()
+        upload_counters.record(user_id, critical=1 if scan['risk_level'] == "Critical" else 0)
+        audit_upload(user_id, filename, scan, ip_address, anomalies)
+        response_cache.invalidate()
+
+        return {
+            "success": True,
+            "message": "File processed successfully.",
+            "data": upload_result(scan)
+        }, 201
+
+    except Exception as e:
+        db.session.rollback()
+        # Don't leave an encrypted blob behind that no File row points to
+        for path in written_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        current_app.logger.error(f"Upload Error: {str(e)}")
+        return {"success": False, "message": "Upload failed", "error": str(e)}, 500
+
+
+def process_upload_batch(user_id, documents, ip_address, locked=False):
+    # Same rules as process_upload applied file by file in order, but the
+    # lock-rule counts and the scans are fetched once for the whole batch
+    # and every row is written in a single transaction.
+    written_paths = []
+    try:
+        if locked:
+            return {"success": False, "message": LOCKED_MESSAGE}, 403
+
+        scans = scan_uploads(documents)
+
+        with metrics.stage("lock_rule_query"):
+            recent_uploads_count, critical_uploads_count = upload_counters.recent(user_id)
+        accepted = critical_accepted = 0
+
+        records = []
+        audits = []
+        results = []
+        locked = False
+        for (filename, file_content), scan in zip(documents, scans):
+            if locked:
+                results.append({"filename": filename, "success": False, "status": 403, "message": LOCKED_MESSAGE})
+                continue
+
+            if scan['risk_level'] == "Critical":
+                if critical_uploads_count >= 2:
+                    locked = True
+                    lock_user(user_id, ip_address)
+                    results.append({"filename": filename, "success": False, "status": 403, "message": LOCKED_MESSAGE})
+                    continue
+                critical_uploads_count += 1
+                critical_accepted += 1
+
+            metrics.upload_size.observe(len(file_content))
+            with metrics.stage("anomaly_checks"):
+                anomalies = anomaly_service.check_upload_anomaly(user_id, len(file_content), recent_uploads_count)
+            recent_uploads_count += 1
+            accepted += 1
+
+            with metrics.stage("encryption"):
+                blob = blob_store.put(file_content, written_paths)
+            records.append(upload_record(user_id, filename, blob, len(file_content), scan))
+            audits.append((filename, scan, anomalies))
+            results.append({"filename": filename, "success": True, "status": 201, **upload_result(scan)})
+
+        with metrics.stage("commit"):
+            db.session.add_all(records)
+            rollups.record(records)
+            db.session.commit()
+        upload_counters.record(user_id, accepted, critical_accepted)
+        for filename, scan, anomalies in audits:
+            audit_upload(user_id, filename, scan, ip_address, anomalies)
+        if locked:
+            revocations.revoke(user_id)
+        response_cache.invalidate()
+
+        return {
+            "success": True,
+            "message": "Batch processed.",
+            "data": {
+                "processed": sum(1 for r in results if r["success"]),
+                "account_locked": locked,
+                "results": results
+            }
+        }, 200
+
+    except Exception as e:
+        db.session.rollback()
+        for path in written_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        current_app.logger.error(f"Batch Upload Error: {str(e)}")
+        return {"success": False, "message": "Batch upload failed", "error": str(e)}, 500
+
+
+def run_upload_job(job_id, user_id, filename, staging_path, ip_address, locked=False):
+    # Executed on the job pool inside an app context.
+    def report_progress(stage, percent):
+        # Best effort: a failed progress write must never fail the upload
+        try:
+            upload_jobs.update(job_id, stage=stage, progress=percent)
+        except Exception as e:
+            current_app.logger.warning(f"Upload Job {job_id} progress update failed: {str(e)}")
+
+    try:
+        upload_jobs.update(job_id, status="running", stage="decrypting", progress=5)
+        file_content = encryption_service.decrypt_file(staging_path)
+        body, status = process_upload(
+            user_id, filename, file_content, ip_address,
+            locked=locked, progress=report_progress
+        )
+        upload_jobs.finish(job_id, body, status)
+    except Exception as e:
+        current_app.logger.error(f"Upload Job {job_id} Error: {str(e)}")
+        upload_jobs.finish(job_id, {"success": False, "message": "Upload failed", "error": str(e)}, 500)
+    finally:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+
+
+def wants_async_upload():
+    requested = request.args.get('async') or request.form.get('async')
+    if requested is not None:
+        return requested.lower() in ('1', 'true', 'yes')
+    return current_app.config.get('UPLOAD_ASYNC', False)
 
 
 @files_bp.route('/upload', methods=['POST'])
@@ -21,12 +320,13 @@ anomaly_service = AnomalyService()
 def upload_file():
     try:
         user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
 
-        if user and user.is_locked:
+        # Lock state from the token; locking revokes older tokens
+        locked = bool(get_jwt().get("locked"))
+        if locked:
             return jsonify({
                 "success": False, 
-                "message": "Account temporarily locked due to repeated high-risk uploads."
+                "message": LOCKED_MESSAGE
             }), 403
 
         if 'file' not in request.files:
@@ -43,119 +343,101 @@ def upload_file():
         if file_size == 0:
             return jsonify({"success": False, "message": "Empty file"}), 400
 
-        # 1. DLP Scanning & Risk Scoring
-        detected_counts = dlp_engine.scan_file(io.BytesIO(file_content), filename)
-        detected_labels = list(detected_counts.keys())
-        is_blocked = len(detected_labels) > 0
-
-        risk_points_map = {
-            "Credit Card": 50,
-            "Aadhaar": 40,
-            "PAN Card": 35,
-            "Email Address": 10,
-            "Phone Number": 10,
-            "API Key": 30,
-            "Password String": 40
-        }
-        
-        total_risk_score = 0
-        for label, count in detected_counts.items():
-            points = risk_points_map.get(label, 10)
-            total_risk_score += points * count
-            
-        risk_level = "Low"
-        if total_risk_score > 100: risk_level = "Critical"
-        elif total_risk_score > 60: risk_level = "High"
-        elif total_risk_score > 20: risk_level = "Medium"
-
-        # 2. Anomaly Detection & Locking Logic
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-        
-        if risk_level == "Critical":
-            critical_uploads_count = File.query.filter(
-                File.user_id == user_id,
-                File.risk_level == "Critical",
-                File.upload_time >= one_hour_ago
-            ).count()
-            
-            if critical_uploads_count >= 2: # This is the 3rd one
-                user.is_locked = True
-                db.session.add(Log(
-                    user_id=user_id,
-                    action="Account Locked",
-                    details=f"User locked due to 3+ Critical uploads in 1 hour.",
-                    ip_address=request.remote_addr
-                ))
-                db.session.commit()
-                return jsonify({
-                    "success": False, 
-                    "message": "Account temporarily locked due to repeated high-risk uploads."
-                }), 403
-
-        recent_uploads_count = File.query.filter(
-            File.user_id == user_id,
-            File.upload_time >= one_hour_ago
-        ).count()
-        
-        anomalies = anomaly_service.check_upload_anomaly(user_id, file_size, recent_uploads_count)
-        for anomaly in anomalies:
-            db.session.add(AnomalyLog(
-                user_id=user_id,
-                anomaly_type=anomaly.get('type'),
-                severity=anomaly.get('severity', 'Medium'),
-                details=anomaly.get('details')
-            ))
-
-        # 3. Encryption and Storage
-        upload_dir = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_dir, exist_ok=True)
+        if wants_async_upload():
+            # Stage the upload encrypted at rest and let the job pool run the pipeline
+            job_id = uuid.uuid4().hex
+            staging_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'staging')
+            os.makedirs(staging_dir, exist_ok=True)
+            staging_path = os.path.join(staging_dir, job_id)
+            encryption_service.encrypt_stream_to_file(io.BytesIO(file_content), staging_path)
 
-        temp_path = os.path.join(upload_dir, f"temp_{filename}")
-        with open(temp_path, 'wb') as f:
-            f.write(file_content)
-        
-        encrypted_filename = f"enc_{filename}"
-        encrypted_path = os.path.join(upload_dir, encrypted_filename)
-        encryption_service.encrypt_file(temp_path, encrypted_path)
-        os.remove(temp_path)
+            db.session.add(UploadJob(id=job_id, user_id=user_id, filename=filename, filesize=file_size))
+            db.session.commit()
 
-        # 4. Save to DB
-        new_file = File(
-            user_id=user_id,
-            filename=filename,
-            encrypted_path=encrypted_path,
-            is_blocked=is_blocked,
-            detected_types=",".join(detected_labels) if detected_labels else None,
-            filesize=file_size,
-            risk_score=total_risk_score,
-            risk_level=risk_level
-        )
-        
-        db.session.add(new_file)
-        db.session.add(Log(
-            user_id=user_id, 
-            action="File Upload", 
-            details=f"File: {filename}, Risk: {risk_level} ({total_risk_score})",
-            ip_address=request.remote_addr
-        ))
-        
-        db.session.commit()
+            upload_jobs.submit(
+                current_app._get_current_object(), run_upload_job,
+                job_id, user_id, filename, staging_path, request.remote_addr, locked
+            )
+            return jsonify({
+                "success": True,
+                "message": "File accepted for processing.",
+                "data": {
+                    "job_id": job_id,
+                    "status": "queued",
+                    "status_url": f"/api/files/jobs/{job_id}"
+                }
+            }), 202
 
-        return jsonify({
-            "success": True,
-            "message": "File processed successfully.",
-            "data": {
-                "risk_score": total_risk_score,
-                "risk_level": risk_level,
-                "is_blocked": is_blocked
-            }
-        }), 201
+        body, status = process_upload(user_id, filename, file_content, request.remote_addr, locked)
+        return jsonify(body), status
 
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Upload Error: {str(e)}")
         return jsonify({"success": False, "message": "Upload failed", "error": str(e)}), 500
 
+@files_bp.route('/upload-batch', methods=['POST'])
+@jwt_required()
+def upload_batch():
+    try:
+        user_id = int(get_jwt_identity())
+
+        files = request.files.getlist('files')
+        if not files:
+            return jsonify({"success": False, "message": "No files part"}), 400
+
+        max_files = current_app.config.get('UPLOAD_BATCH_MAX_FILES', 200)
+        if len(files) > max_files:
+            return jsonify({"success": False, "message": f"Too many files (Max {max_files} per batch)"}), 400
+
+        documents = []
+        rejected = {}
+        for index, file in enumerate(files):
+            filename = secure_filename(file.filename or '')
+            file_content = file.read()
+            if not filename or not file_content:
+                rejected[index] = {
+                    "filename": file.filename,
+                    "success": False,
+                    "status": 400,
+                    "message": "No selected file" if not filename else "Empty file"
+                }
+            else:
+                documents.append((filename, file_content))
+
+        if documents:
+            body, status = process_upload_batch(user_id, documents, request.remote_addr, bool(get_jwt().get("locked")))
+        else:
+            body, status = {"success": True, "message": "Batch processed.", "data": {"processed": 0, "account_locked": False, "results": []}}, 200
+
+        # Put per-file validation failures back in request order
+        if status == 200 and rejected:
+            processed = iter(body["data"]["results"])
+            body["data"]["results"] = [rejected[i] if i in rejected else next(processed) for i in range(len(files))]
+
+        return jsonify(body), status
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Batch Upload Error: {str(e)}")
+        return jsonify({"success": False, "message": "Batch upload failed", "error": str(e)}), 500
+
+@files_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_upload_job(job_id):
+    try:
+        user_id = int(get_jwt_identity())
+        job = UploadJob.query.filter_by(id=job_id, user_id=user_id).first()
+        if not job:
+            return jsonify({"success": False, "message": "Job not found"}), 404
+
+        return jsonify({
+            "success": True,
+            "data": upload_jobs.serialize(job)
+        }), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": "Failed to fetch job", "error": str(e)}), 500
+
 @files_bp.route('/my-files', methods=['GET'])
 @jwt_required()
 def get_my_files():
@@ -167,8 +449,9 @@ def get_my_files():
         blocked = request.args.get('blocked')
         search = request.args.get('search')
         date_from = request.args.get('date_from')
+        detection_type = request.args.get('type')
 
-        query = File.query.filter_by(user_id=user_id)
+        query = File.query.filter_by(user_id=user_id).options(selectinload(File.detections))
 
         if risk:
             query = query.filter(File.risk_level == risk)
@@ -176,6 +459,13 @@ def get_my_files():
             query = query.filter(File.is_blocked == (blocked.lower() == 'true'))
         if search:
             query = query.filter(File.filename.like(f"%{search}%"))
+        if detection_type:
+            query = query.filter(File.id.in_(
+                db.session.query(Detection.file_id).filter(
+                    Detection.user_id == user_id,
+                    Detection.detection_type == detection_type
+                )
+            ))
         if date_from:
             try:
                 dt = datetime.strptime(date_from, '%Y-%m-%d')
@@ -183,16 +473,21 @@ def get_my_files():
             except ValueError:
                 pass
 
-        files = query.order_by(File.upload_time.desc()).all()
+        files, next_cursor = keyset_page(
+            query, File.upload_time, File.id,
+            request.args.get('cursor'), page_limit(request.args.get('limit'))
+        )
 
         return jsonify({
             "success": True,
             "message": "Files retrieved successfully",
+            "next_cursor": next_cursor,
             "data": [{
                 "id": f.id,
                 "filename": f.filename,
                 "is_blocked": f.is_blocked,
                 "detected_types": f.detected_types,
+                "detections": {d.detection_type: d.count for d in f.detections},
                 "filesize": f.filesize,
                 "risk_score": f.risk_score,
                 "risk_level": f.risk_level,
@@ -200,6 +495,8 @@ def get_my_files():
             } for f in files]
         }), 200
 
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "message": "Failed to fetch files", "error": str(e)}), 500
 
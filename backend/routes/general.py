@@ -1,5 +1,5 @@
-from flask import Blueprint, jsonify
-from extensions import db
+from flask import Blueprint, jsonify, request, Response
+from extensions import db, metrics, replicas
 from sqlalchemy import text
 
 general_bp = Blueprint('general', __name__)
@@ -11,7 +11,8 @@ def health_check():
         db.session.execute(text("SELECT 1"))
         return jsonify({
             "status": "healthy",
-            "database": "connected"
+            "database": "connected",
+            "replica": replicas.stats()
         }), 200
     except Exception as e:
         return jsonify({
@@ -19,3 +20,10 @@ def health_check():
             "database": "disconnected",
             "error": str(e)
         }), 500
+
+@general_bp.route("/metrics")
+def prometheus_metrics():
+    if not metrics.authorized(request.headers.get("Authorization")):
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    body, content_type = metrics.render()
+    return Response(body, mimetype=content_type)
@@ -1,12 +1,14 @@
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, File, AnomalyLog, User
+from models import db, File, Detection, AnomalyLog, User
+from extensions import replicas
 from sqlalchemy import func
 
 users_bp = Blueprint('users', __name__)
 
 @users_bp.route('/risk-profile', methods=['GET'])
 @jwt_required()
+@replicas.read_only
 def get_risk_profile():
     try:
         user_id = int(get_jwt_identity())
@@ -21,7 +23,8 @@ def get_risk_profile():
                     "average_risk": 0,
                     "high_risk_percentage": 0,
                     "recent_anomalies": 0,
-                    "risk_status": "Normal"
+                    "risk_status": "Normal",
+                    "detection_types": []
                 }
             }), 200
 
@@ -32,6 +35,12 @@ def get_risk_profile():
         ).count()
         
         recent_anomalies = AnomalyLog.query.filter_by(user_id=user_id).count()
+
+        detection_types = db.session.query(
+            Detection.detection_type,
+            func.count(Detection.id),
+            func.sum(Detection.count)
+        ).filter(Detection.user_id == user_id).group_by(Detection.detection_type).all()
         
         percentage = (high_risk_count / total_uploads) * 100
         
@@ -48,7 +57,8 @@ def get_risk_profile():
                 "average_risk": round(float(avg_risk), 2),
                 "high_risk_percentage": round(percentage, 2),
                 "recent_anomalies": recent_anomalies,
-                "risk_status": risk_status
+                "risk_status": risk_status,
+                "detection_types": [{"type": t, "files": files, "matches": int(matches)} for t, files, matches in detection_types]
             }
         }), 200
 
@@ -0,0 +1,332 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from extensions import db
+from models import File
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+EPOCH = datetime(1970, 1, 1)
+
+# Flask's default instance folder for this app (backend/instance)
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance")
+
+
+def minute_of(moment):
+    # Naive UTC datetime (as stored in the DB) -> minute since the epoch
+    return int((moment - EPOCH).total_seconds() // 60)
+
+
+# ==========================
+# COUNTER BACKENDS
+# ==========================
+# A backend stores per-minute buckets under a key plus a "warm" marker per
+# user. A user without a marker has never been loaded (or the backend was
+# reset) and gets rebuilt from the DB on the next read. get/put hold single
+# numbers with an expiry, for other per-user state shared across workers.
+class MemoryCounterBackend:
+    # Per process only: fine for the dev server, undercounts under several workers.
+    def __init__(self):
+        self._buckets = {}
+        self._warm = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key, minute, amount):
+        with self._lock:
+            buckets = self._buckets.setdefault(key, {})
+            buckets[minute] = buckets.get(minute, 0) + amount
+
+    def total(self, key, since_minute):
+        with self._lock:
+            buckets = self._buckets.get(key, {})
+            for minute in [m for m in buckets if m < since_minute]:
+                del buckets[minute]
+            return sum(buckets.values())
+
+    def replace(self, key, buckets):
+        with self._lock:
+            self._buckets[key] = dict(buckets)
+
+    def is_warm(self, key):
+        with self._lock:
+            return self._warm.get(key, 0) > time.time()
+
+    def mark_warm(self, key, seconds):
+        with self._lock:
+            self._warm[key] = time.time() + seconds
+
+    def clear_warm(self, key):
+        with self._lock:
+            self._warm.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            value, expires = self._values.get(key, (None, 0))
+            return value if expires > time.time() else None
+
+    def put(self, key, value, seconds):
+        with self._lock:
+            self._values[key] = (value, time.time() + seconds)
+
+
+class SQLiteCounterBackend:
+    # Shared by every worker process on one host through a WAL-mode file. The
+    # file decides account locks, token revocations and login throttling, so
+    # it is created owner-only and one owned by another user is refused.
+    def __init__(self, path):
+        self._secure_file(path)
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS counter_buckets ("
+                "key TEXT NOT NULL, minute INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (key, minute))"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS counter_warm (key TEXT PRIMARY KEY, expires REAL NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS counter_values (key TEXT PRIMARY KEY, value REAL NOT NULL, expires REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def _secure_file(path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        try:
+            if hasattr(os, "getuid") and os.fstat(fd).st_uid != os.getuid():
+                raise RuntimeError(f"Activity counter file {path} is owned by another user")
+            if os.fstat(fd).st_mode & 0o077:
+                os.fchmod(fd, 0o600)
+        finally:
+            os.close(fd)
+        # SQLite reuses journal files it finds next to the database
+        for suffix in ("-wal", "-shm"):
+            try:
+                info = os.lstat(path + suffix)
+            except FileNotFoundError:
+                continue
+            if hasattr(os, "getuid") and info.st_uid != os.getuid():
+                raise RuntimeError(f"Activity counter file {path + suffix} is owned by another user")
+
+    def _wrote(self):
+        # Called with the lock held. Every 1000 writes, drop what has expired.
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            # Nothing reads further back than a day
+            self._conn.execute("DELETE FROM counter_buckets WHERE minute < ?",
+                               (minute_of(datetime.utcnow()) - 24 * 60,))
+            now = time.time()
+            self._conn.execute("DELETE FROM counter_warm WHERE expires <= ?", (now,))
+            self._conn.execute("DELETE FROM counter_values WHERE expires <= ?", (now,))
+
+    def incr(self, key, minute, amount):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO counter_buckets (key, minute, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (key, minute) DO UPDATE SET count = count + excluded.count",
+                (key, minute, amount)
+            )
+            self._wrote()
+
+    def total(self, key, since_minute):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM counter_buckets WHERE key = ? AND minute >= ?",
+                (key, since_minute)
+            ).fetchone()
+        return row[0]
+
+    def replace(self, key, buckets):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM counter_buckets WHERE key = ?", (key,))
+                self._conn.executemany(
+                    "INSERT INTO counter_buckets (key, minute, count) VALUES (?, ?, ?)",
+                    [(key, minute, count) for minute, count in buckets.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def is_warm(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT expires FROM counter_warm WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def mark_warm(self, key, seconds):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO counter_warm (key, expires) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET expires = excluded.expires",
+                (key, time.time() + seconds)
+            )
+            self._wrote()
+
+    def clear_warm(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM counter_warm WHERE key = ?", (key,))
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM counter_values WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, value, seconds):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO counter_values (key, value, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+                (key, value, time.time() + seconds)
+            )
+            self._wrote()
+
+
+class RedisCounterBackend:
+    # Any Redis-protocol server (Redis, Valkey, KeyDB, ...); one hash per key,
+    # one field per minute, expired as a whole once the window has passed.
+    def __init__(self, url, ttl_seconds):
+        if redis is None:
+            raise RuntimeError("ACTIVITY_COUNTER_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self._ttl = ttl_seconds
+
+    def incr(self, key, minute, amount):
+        pipe = self._client.pipeline()
+        pipe.hincrby(key, minute, amount)
+        pipe.expire(key, self._ttl)
+        pipe.execute()
+
+    def total(self, key, since_minute):
+        return sum(int(count) for minute, count in self._client.hgetall(key).items()
+                   if int(minute) >= since_minute)
+
+    def replace(self, key, buckets):
+        pipe = self._client.pipeline()
+        pipe.delete(key)
+        if buckets:
+            pipe.hset(key, mapping=buckets)
+            pipe.expire(key, self._ttl)
+        pipe.execute()
+
+    def is_warm(self, key):
+        return bool(self._client.exists(f"{key}:warm"))
+
+    def mark_warm(self, key, seconds):
+        self._client.set(f"{key}:warm", 1, ex=int(seconds))
+
+    def clear_warm(self, key):
+        self._client.delete(f"{key}:warm")
+
+    def get(self, key):
+        value = self._client.get(key)
+        return float(value) if value is not None else None
+
+    def put(self, key, value, seconds):
+        self._client.set(key, value, ex=int(seconds))
+
+
+def counter_backend_from_env(redis_ttl_seconds):
+    kind = os.getenv("ACTIVITY_COUNTER_BACKEND", "sqlite").lower()
+    if kind == "memory":
+        return MemoryCounterBackend()
+    if kind == "redis":
+        return RedisCounterBackend(
+            os.getenv("ACTIVITY_COUNTER_REDIS_URL", "redis://localhost:6379/0"),
+            redis_ttl_seconds
+        )
+    if kind == "sqlite":
+        path = os.getenv("ACTIVITY_COUNTER_SQLITE_PATH",
+                         os.path.join(INSTANCE_DIR, "dlp_activity_counters.sqlite"))
+        return SQLiteCounterBackend(path)
+    raise ValueError(f"Unknown ACTIVITY_COUNTER_BACKEND '{kind}' (memory, sqlite or redis)")
+
+
+def database_namespace():
+    # Keys are namespaced by database so a shared backend never mixes two
+    # deployments (or a dropped and recreated database) together.
+    return hashlib.sha1(str(db.engine.url).encode()).hexdigest()[:8]
+
+
+# ==========================
+# UPLOAD ACTIVITY COUNTERS
+# ==========================
+class ActivityCounterService:
+    def __init__(self, backend=None, window_minutes=60):
+        self.window_minutes = window_minutes
+        self.backend = backend if backend is not None else self._backend_from_env()
+
+    def _backend_from_env(self):
+        return counter_backend_from_env((self.window_minutes + 1) * 60)
+
+    def _keys(self, user_id):
+        namespace = database_namespace()
+        return (f"dlp:{namespace}:uploads:{user_id}",
+                f"dlp:{namespace}:critical:{user_id}",
+                f"dlp:{namespace}:user:{user_id}")
+
+    def _rebuild(self, user_id):
+        # Cold start: load the window's buckets from the files table once, then
+        # keep them current from the upload path until the marker expires.
+        uploads_key, critical_key, warm_key = self._keys(user_id)
+        since = datetime.utcnow() - timedelta(minutes=self.window_minutes)
+        uploads, critical = {}, {}
+        for upload_time, risk_level in db.session.query(File.upload_time, File.risk_level).filter(
+            File.user_id == user_id,
+            File.upload_time >= since
+        ):
+            minute = minute_of(upload_time)
+            uploads[minute] = uploads.get(minute, 0) + 1
+            if risk_level == "Critical":
+                critical[minute] = critical.get(minute, 0) + 1
+        self.backend.replace(uploads_key, uploads)
+        self.backend.replace(critical_key, critical)
+        self.backend.mark_warm(warm_key, self.window_minutes * 60)
+
+    def recent(self, user_id):
+        # -> (uploads, critical uploads) in the last window, from the counters.
+        # If the backend is unreachable the DB is counted directly instead.
+        uploads_key, critical_key, warm_key = self._keys(user_id)
+        since_minute = minute_of(datetime.utcnow()) - self.window_minutes + 1
+        try:
+            if not self.backend.is_warm(warm_key):
+                self._rebuild(user_id)
+            return self.backend.total(uploads_key, since_minute), self.backend.total(critical_key, since_minute)
+        except Exception as e:
+            current_app.logger.warning(f"Activity counters unavailable, counting in DB: {e}")
+            return self._count_in_db(user_id)
+
+    def _count_in_db(self, user_id):
+        since = datetime.utcnow() - timedelta(minutes=self.window_minutes)
+        recent = File.query.filter(File.user_id == user_id, File.upload_time >= since)
+        return recent.count(), recent.filter(File.risk_level == "Critical").count()
+
+    def record(self, user_id, uploads=1, critical=0):
+        # Called after the upload rows are committed.
+        uploads_key, critical_key, warm_key = self._keys(user_id)
+        now_minute = minute_of(datetime.utcnow())
+        try:
+            if uploads:
+                self.backend.incr(uploads_key, now_minute, uploads)
+            if critical:
+                self.backend.incr(critical_key, now_minute, critical)
+        except Exception as e:
+            current_app.logger.warning(f"Activity counter update failed: {e}")
+            try:
+                # Force a rebuild so the missed update is picked up from the DB
+                self.backend.clear_warm(warm_key)
+            except Exception:
+                pass
@@ -31,8 +31,10 @@ class AnomalyService:
             
         return anomalies
 
-    def check_login_anomaly(self, user_id, failed_attempts):
-        if failed_attempts >= self.THRESHOLDS['failed_logins']:
+    def check_login_anomaly(self, user_id, failed_attempts, threshold=None):
+        if threshold is None:
+            threshold = self.THRESHOLDS['failed_logins']
+        if failed_attempts >= threshold:
             return {
                 'type': 'Brute Force Attempt',
                 'severity': 'High',
@@ -0,0 +1,192 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+from flask import has_app_context
+from extensions import db, response_cache
+from models import Log, AnomalyLog
+
+TABLES = {'logs': Log, 'anomaly_logs': AnomalyLog}
+
+
+# ==========================
+# AUDIT SINK
+# ==========================
+# Routine audit rows (logins, uploads, anomalies) are handed to a writer
+# thread and inserted in multi-row batches of AUDIT_BATCH_SIZE, or every
+# AUDIT_FLUSH_INTERVAL seconds, on the writer's own connection; the request
+# no longer pays for those INSERTs. Rows keep the time they were recorded.
+#
+# sync=True events (account locks) are added to the caller's session instead
+# and commit atomically with the change they describe. AUDIT_MODE=sync writes
+# every event before returning, without the writer thread.
+#
+# When the queue (AUDIT_QUEUE_SIZE) stays full, callers write their event
+# themselves rather than dropping it. Pending events are flushed at exit, so
+# a graceful restart loses nothing.
+class AuditService:
+    def __init__(self):
+        self.mode = os.getenv("AUDIT_MODE", "async").lower()
+        self.batch_size = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+        self.flush_interval = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+        self.queue_size = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+        self.enqueue_timeout = float(os.getenv("AUDIT_ENQUEUE_TIMEOUT", "0.5"))
+
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.counters = {'queued': 0, 'written': 0, 'batches': 0, 'direct_writes': 0, 'flush_errors': 0}
+
+    def init_app(self, app):
+        if self.app is None:
+            atexit.register(self.close)
+        self.app = app
+
+    # ---------- recording ----------
+    def log(self, user_id, action, details, ip_address=None, sync=False):
+        self._record('logs', {
+            'user_id': user_id,
+            'action': action,
+            'details': details,
+            'ip_address': ip_address,
+            'timestamp': datetime.utcnow()
+        }, sync)
+
+    def anomaly(self, user_id, anomaly_type, severity, details, sync=False):
+        self._record('anomaly_logs', {
+            'user_id': user_id,
+            'anomaly_type': anomaly_type,
+            'severity': severity,
+            'details': details,
+            'timestamp': datetime.utcnow()
+        }, sync)
+
+    def _record(self, table, row, sync):
+        if sync:
+            db.session.add(TABLES[table](**row))
+            return
+        if self.mode == 'sync' or self.app is None:
+            self._write_direct(table, row)
+            return
+
+        self._ensure_writer()
+        try:
+            self._queue.put(('row', table, row), timeout=self.enqueue_timeout)
+            self._count('queued')
+        except queue.Full:
+            # Backpressure: the writer is behind, so this request pays for its own row
+            self._write_direct(table, row)
+
+    def _write_direct(self, table, row):
+        if not has_app_context():
+            with self.app.app_context():
+                return self._write_direct(table, row)
+        with db.engine.begin() as conn:
+            conn.execute(TABLES[table].__table__.insert(), [row])
+        self._count('direct_writes')
+        if table == 'anomaly_logs':
+            response_cache.invalidate()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    # ---------- writer thread ----------
+    def _ensure_writer(self):
+        # Started lazily and per process, so forked workers get their own
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            pending = []
+            next_flush = time.monotonic() + self.flush_interval
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+                except queue.Empty:
+                    item = None
+
+                if item is not None and item[0] == 'row':
+                    pending.append(item[1:])
+                    # Steady traffic never lets get() time out, so check the clock too
+                    if len(pending) < self.batch_size and time.monotonic() < next_flush:
+                        continue
+
+                if pending:
+                    pending = self._flush(pending)
+                next_flush = time.monotonic() + self.flush_interval
+
+                if item is not None and item[0] in ('flush', 'stop'):
+                    # Asked to finish: a couple more tries if the DB just failed
+                    for _ in range(2):
+                        if pending:
+                            pending = self._flush(pending)
+                    if pending and item[0] == 'stop':
+                        self.app.logger.error(f"Audit writer stopping with {len(pending)} unwritten event(s)")
+                    item[1].set()
+                    if item[0] == 'stop':
+                        return
+
+    def _flush(self, pending):
+        # -> rows still to write (all of them if the DB refused the batch)
+        grouped = {}
+        for table, row in pending:
+            grouped.setdefault(table, []).append(row)
+        try:
+            with db.engine.begin() as conn:
+                for table, rows in grouped.items():
+                    conn.execute(TABLES[table].__table__.insert(), rows)
+        except Exception as e:
+            self._count('flush_errors')
+            self.app.logger.error(f"Audit flush of {len(pending)} event(s) failed, will retry: {e}")
+            if len(pending) > self.queue_size:
+                self.app.logger.error(f"Audit backlog full, dropping {len(pending) - self.queue_size} oldest event(s)")
+                pending = pending[-self.queue_size:]
+            time.sleep(min(self.flush_interval, 5))
+            return pending
+        finally:
+            db.session.remove()
+
+        self._count('written', len(pending))
+        self._count('batches')
+        if 'anomaly_logs' in grouped:
+            response_cache.invalidate()
+        return []
+
+    def _signal(self, kind, timeout):
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put((kind, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def flush(self, timeout=10):
+        # Blocks until everything recorded so far is written
+        return self._signal('flush', timeout)
+
+    def close(self, timeout=10):
+        if self._signal('stop', timeout) and self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            backlog = self._queue.qsize() if self._queue is not None else 0
+            return {'mode': self.mode, 'backlog': backlog, **self.counters}
+
+
+audit = AuditService()
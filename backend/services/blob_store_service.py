@@ -0,0 +1,283 @@
+import io
+import os
+import uuid
+import shutil
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, func, exists
+from sqlalchemy.dialects import mysql, sqlite
+from extensions import db
+from models import File, Blob
+
+BLOBS = Blob.__table__
+FILES = File.__table__
+
+
+# ==========================
+# CONTENT-ADDRESSED BLOB STORE
+# ==========================
+# Uploads are encrypted once per distinct content into UPLOAD_FOLDER/blobs,
+# keyed by EncryptionService.content_id (a keyed hash of the plaintext). An
+# upload of content the store already has only adds a reference to its Blob
+# row, in the upload's transaction: nothing is encrypted or written again.
+#
+# Every blob file gets a unique name, so a blob collected while the same
+# content is being uploaded again never takes the new copy with it.
+# References are only added on the request path; gc() recounts them from the
+# files table (which also catches rows removed by ON DELETE CASCADE) and
+# removes blobs nobody references, and files on disk that no blob row points
+# to, once they have been untouched for BLOB_GC_GRACE_MINUTES.
+class BlobStoreService:
+    def __init__(self, encryption_service, grace_minutes=None, batch_size=500):
+        self.encryption = encryption_service
+        minutes = grace_minutes if grace_minutes is not None else int(os.getenv("BLOB_GC_GRACE_MINUTES", "60"))
+        self.grace = timedelta(minutes=minutes)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.counters = {'stored': 0, 'deduplicated': 0}
+
+    def root(self):
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs')
+
+    def _new_path(self, content_hash):
+        directory = os.path.join(self.root(), content_hash[:2])
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{content_hash}_{uuid.uuid4().hex[:12]}")
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    # ---------- references ----------
+    def _add_references(self, content_hash, count):
+        # -> path of the stored blob, or None if the store doesn't have it
+        updated = db.session.execute(BLOBS.update().where(BLOBS.c.content_hash == content_hash).values(
+            ref_count=BLOBS.c.ref_count + count, updated_at=datetime.utcnow()
+        ))
+        if updated.rowcount == 0:
+            return None
+        return db.session.execute(select(BLOBS.c.path).where(BLOBS.c.content_hash == content_hash)).scalar()
+
+    def _create(self, content_hash, path, size, count):
+        # Inserts the blob row, or adds the references to the row another
+        # upload of the same content just created. -> path of the stored blob
+        now = datetime.utcnow()
+        row = {'content_hash': content_hash, 'path': path, 'size': size,
+               'ref_count': count, 'created_at': now, 'updated_at': now}
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            stmt = mysql.insert(BLOBS).values(row)
+            db.session.execute(stmt.on_duplicate_key_update(
+                ref_count=BLOBS.c.ref_count + stmt.inserted.ref_count, updated_at=stmt.inserted.updated_at
+            ))
+        elif dialect == 'sqlite':
+            stmt = sqlite.insert(BLOBS).values(row)
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['content_hash'],
+                set_={'ref_count': BLOBS.c.ref_count + stmt.excluded.ref_count, 'updated_at': stmt.excluded.updated_at}
+            ))
+        elif self._add_references(content_hash, count) is None:
+            db.session.execute(BLOBS.insert().values(row))
+        return db.session.execute(select(BLOBS.c.path).where(BLOBS.c.content_hash == content_hash)).scalar()
+
+    def _replace_path(self, content_hash, path):
+        # The row outlived its file (restored database, lost volume)
+        db.session.execute(BLOBS.update().where(BLOBS.c.content_hash == content_hash).values(path=path))
+        db.session.execute(FILES.update().where(FILES.c.content_hash == content_hash).values(encrypted_path=path))
+
+    def put(self, file_content, written):
+        # Stores file_content, or references the copy already stored, in the
+        # caller's transaction. -> (content_hash, path). Files written are
+        # appended to `written` so the caller can remove them on rollback.
+        content_hash = self.encryption.content_id(file_content)
+        path = self._add_references(content_hash, 1)
+        if path is not None and os.path.exists(path):
+            self._count('deduplicated')
+            return content_hash, path
+
+        new_path = self._new_path(content_hash)
+        self.encryption.encrypt_stream_to_file(io.BytesIO(file_content), new_path)
+        written.append(new_path)
+        self._count('stored')
+        if path is not None:
+            self._replace_path(content_hash, new_path)
+            return content_hash, new_path
+
+        path = self._create(content_hash, new_path, len(file_content), 1)
+        if path != new_path:
+            # Lost the race to a concurrent upload of the same content
+            written.remove(new_path)
+            os.remove(new_path)
+        return content_hash, path
+
+    # ---------- legacy uploads ----------
+    def _hash_file(self, encrypted_path):
+        hasher = self.encryption.content_hasher()
+        size = 0
+        with open(encrypted_path, 'rb') as f:
+            for chunk in self.encryption.iter_decrypt_stream(f):
+                hasher.update(chunk)
+                size += len(chunk)
+        return hasher.hexdigest(), size
+
+    def _import_path(self, old_path):
+        # Moves one pre-store file into the store along with every File row
+        # that points to it. -> True if the content was already stored.
+        content_hash, size = self._hash_file(old_path)
+        count = db.session.execute(select(func.count()).select_from(FILES).where(
+            FILES.c.encrypted_path == old_path, FILES.c.content_hash.is_(None)
+        )).scalar()
+
+        path = self._add_references(content_hash, count)
+        deduplicated = path is not None and os.path.exists(path)
+        new_path = None
+        if not deduplicated:
+            # Already encrypted: linked into place, not encrypted again
+            new_path = self._new_path(content_hash)
+            try:
+                os.link(old_path, new_path)
+            except OSError:
+                shutil.copyfile(old_path, new_path)
+            if path is None:
+                path = self._create(content_hash, new_path, size, count)
+            else:
+                self._replace_path(content_hash, new_path)
+                path = new_path
+
+        db.session.execute(FILES.update().where(
+            FILES.c.encrypted_path == old_path, FILES.c.content_hash.is_(None)
+        ).values(content_hash=content_hash, encrypted_path=path))
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if new_path:
+                os.remove(new_path)
+            raise
+
+        if new_path and new_path != path:
+            os.remove(new_path)
+        if old_path != path:
+            os.remove(old_path)
+        return deduplicated
+
+    def import_legacy(self, report=print):
+        # Files uploaded before the store (content_hash NULL), in id order
+        totals = {'imported': 0, 'deduplicated': 0, 'missing': 0, 'failed': 0}
+        done = set()
+        last_id = 0
+        while True:
+            batch = db.session.execute(
+                select(FILES.c.id, FILES.c.encrypted_path)
+                .where(FILES.c.id > last_id, FILES.c.content_hash.is_(None))
+                .order_by(FILES.c.id).limit(self.batch_size)
+            ).all()
+            db.session.rollback()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for file_id, old_path in batch:
+                if old_path in done:
+                    continue
+                done.add(old_path)
+                if not os.path.exists(old_path):
+                    totals['missing'] += 1
+                    report(f"file {file_id}: {old_path} not found, left as is")
+                    continue
+                try:
+                    totals['deduplicated' if self._import_path(old_path) else 'imported'] += 1
+                except Exception as e:
+                    db.session.rollback()
+                    totals['failed'] += 1
+                    report(f"file {file_id}: {old_path} could not be imported: {str(e) or type(e).__name__}")
+        return totals
+
+    # ---------- garbage collection ----------
+    def gc(self, dry_run=False):
+        totals = {'recounted': 0, 'blobs_removed': 0, 'bytes_removed': 0, 'orphan_files_removed': 0}
+        cutoff = datetime.utcnow() - self.grace
+        settled = BLOBS.c.updated_at < cutoff
+        references = select(func.count(FILES.c.id)).where(FILES.c.content_hash == BLOBS.c.content_hash).scalar_subquery()
+
+        # 1. Reference counts from the files table
+        drifted = [settled, BLOBS.c.ref_count != references]
+        if dry_run:
+            totals['recounted'] = db.session.execute(select(func.count()).select_from(BLOBS).where(*drifted)).scalar()
+            unreferenced = references == 0
+        else:
+            totals['recounted'] = db.session.execute(BLOBS.update().where(*drifted).values(ref_count=references)).rowcount
+            db.session.commit()
+            unreferenced = BLOBS.c.ref_count <= 0
+
+        # 2. Unreferenced blobs; rows go first, files once that has committed
+        last_hash = ''
+        while True:
+            query = select(BLOBS.c.content_hash, BLOBS.c.path, BLOBS.c.size).where(
+                BLOBS.c.content_hash > last_hash, unreferenced, settled
+            ).order_by(BLOBS.c.content_hash).limit(self.batch_size)
+            candidates = db.session.execute(query if dry_run else query.with_for_update()).all()
+            if not candidates:
+                db.session.rollback()
+                break
+            last_hash = candidates[-1].content_hash
+            hashes = [candidate.content_hash for candidate in candidates]
+
+            if dry_run:
+                removed = candidates
+            else:
+                db.session.execute(BLOBS.delete().where(
+                    BLOBS.c.content_hash.in_(hashes), unreferenced, settled,
+                    ~exists().where(FILES.c.content_hash == BLOBS.c.content_hash)
+                ))
+                kept = set(db.session.execute(
+                    select(BLOBS.c.content_hash).where(BLOBS.c.content_hash.in_(hashes))
+                ).scalars())
+                db.session.commit()
+                removed = [candidate for candidate in candidates if candidate.content_hash not in kept]
+                for candidate in removed:
+                    try:
+                        os.remove(candidate.path)
+                    except FileNotFoundError:
+                        pass
+            totals['blobs_removed'] += len(removed)
+            totals['bytes_removed'] += sum(candidate.size or 0 for candidate in removed)
+
+        # 3. Files no row points to: failed uploads, lost races, crashed imports
+        root = self.root()
+        prefixes = sorted(os.listdir(root)) if os.path.isdir(root) else []
+        for prefix in prefixes:
+            directory = os.path.join(root, prefix)
+            if not os.path.isdir(directory):
+                continue
+            known = set(db.session.execute(
+                select(BLOBS.c.path).where(BLOBS.c.content_hash.like(f"{prefix}%"))
+            ).scalars())
+            db.session.rollback()
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                try:
+                    if path in known or datetime.utcfromtimestamp(os.path.getmtime(path)) >= cutoff:
+                        continue
+                    if not dry_run:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
+                totals['orphan_files_removed'] += 1
+        return totals
+
+    def stats(self):
+        blobs, stored_bytes, references, referenced_bytes = db.session.execute(select(
+            func.count(),
+            func.coalesce(func.sum(BLOBS.c.size), 0),
+            func.coalesce(func.sum(BLOBS.c.ref_count), 0),
+            func.coalesce(func.sum(BLOBS.c.size * BLOBS.c.ref_count), 0)
+        ).select_from(BLOBS)).one()
+        with self._lock:
+            return {
+                'blobs': blobs,
+                'references': int(references),
+                'stored_bytes': int(stored_bytes),
+                'referenced_bytes': int(referenced_bytes),
+                **self.counters
+            }
@@ -1,10 +1,309 @@
 import re
+import os
+import io
+import json
+import time
+import hashlib
+import bz2
+import gzip
+import lzma
+import codecs
+import signal
+import tarfile
+import zipfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 import PyPDF2
 from docx import Document
-import io
+
+# Characters that can appear inside an email match (local part, '@', domain, TLD).
+EMAIL_RUN = re.compile(r"[A-Za-z0-9._%+|@-]*")
+EMAIL_LOCAL_RUN = re.compile(r"[A-Za-z0-9._%+-]*")
+EMAIL_DOMAIN = re.compile(r"[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b")
+
+# Ordering used when a fail-closed level is applied to an incomplete scan
+RISK_LEVELS = ["Low", "Medium", "High", "Critical"]
+
+# Streaming defaults (in characters). A block is only scanned up to the last
+# character each detector cannot match across, and the rest is carried into
+# the next block, so a match is never split unless it runs on for more than
+# STREAM_MAX_HOLD characters without one.
+STREAM_BLOCK_SIZE = 256 * 1024
+STREAM_OVERLAP = 4096
+STREAM_MAX_HOLD = 64 * 1024
+
+
+# ==========================
+# CANDIDATE VALIDATORS
+# ==========================
+# Each takes the list of candidate strings a detector matched in one buffer and
+# returns one bool per candidate, so the per-call overhead is paid per batch.
+LUHN_DOUBLED = [0, 2, 4, 6, 8, 1, 3, 5, 7, 9]
+
+VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6],
+    [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8],
+    [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2],
+    [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4],
+    [9, 8, 7, 6, 5, 4, 3, 2, 1, 0]
+]
+VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9],
+    [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2],
+    [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0],
+    [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5],
+    [7, 0, 4, 6, 9, 1, 3, 2, 5, 8]
+]
+
+# Bumped whenever a validator's logic changes, so cached results are rescanned
+VALIDATORS_REVISION = 2
+
+# 4th character of a PAN encodes the holder type (P individual, C company, ...)
+PAN_HOLDER_TYPES = frozenset("ABCFGHJLPT")
+
+
+def validate_cards(candidates):
+    results = []
+    for candidate in candidates:
+        digits = [int(ch) for ch in candidate if ch.isdecimal()]
+        total = 0
+        for i, digit in enumerate(reversed(digits)):
+            total += LUHN_DOUBLED[digit] if i % 2 else digit
+        results.append(total % 10 == 0)
+    return results
+
+
+def validate_aadhaar(candidates):
+    results = []
+    for candidate in candidates:
+        digits = [int(ch) for ch in candidate if ch.isdecimal()]
+        # UIDAI never issues numbers starting with 0 or 1
+        if len(digits) != 12 or digits[0] < 2:
+            results.append(False)
+            continue
+        check = 0
+        for i, digit in enumerate(reversed(digits)):
+            check = VERHOEFF_D[check][VERHOEFF_P[i % 8][digit]]
+        results.append(check == 0)
+    return results
+
+
+def validate_pan(candidates):
+    return [candidate[3] in PAN_HOLDER_TYPES and candidate[5:9] != "0000" for candidate in candidates]
+
+
+def new_scan_stats():
+    return {
+        "candidates": {},
+        "accepted": {},
+        "rejected": {},
+        "candidate_seconds": 0.0,
+        "validation_seconds": 0.0
+    }
+
+
+def merge_stats(total, stats):
+    # `total` may be any dict (e.g. a caller's empty {}); missing keys are created
+    for stage in ("candidates", "accepted", "rejected"):
+        merge_counts(total.setdefault(stage, {}), stats[stage])
+    total["candidate_seconds"] = total.get("candidate_seconds", 0.0) + stats["candidate_seconds"]
+    total["validation_seconds"] = total.get("validation_seconds", 0.0) + stats["validation_seconds"]
+    return total
+
+
+def merge_counts(total, counts):
+    for label, count in counts.items():
+        total[label] = total.get(label, 0) + count
+    return total
+
+
+def is_word_char(ch):
+    # Same definition \b uses for str patterns
+    return ch.isalnum() or ch == "_"
+
+
+class LinearEmailMatcher:
+    # Drop-in for the email regex's finditer that runs in linear time.
+    #
+    # The local part cannot contain '@', so every match ends its local part at
+    # the first '@' after its start, and what follows the '@' does not depend
+    # on where the match started. Matches are therefore found per '@': the
+    # domain is matched once, and the start is the first word boundary in the
+    # run of local-part characters before it. The backtracking regex instead
+    # retries the whole run from every boundary, which is quadratic on inputs
+    # like "a.a.a.a...". The real regex is run once from the known start so
+    # callers still get an ordinary Match object.
+    def __init__(self, regex):
+        self.regex = regex
+
+    def finditer(self, text, pos=0, endpos=None):
+        endpos = len(text) if endpos is None else min(endpos, len(text))
+        # Only the window is reversed: a start before `pos` is never reported
+        reversed_window = None
+        floor = pos
+        at = text.find('@', pos, endpos)
+        while at != -1:
+            if reversed_window is None:
+                reversed_window = text[pos:endpos][::-1]
+            run_start = endpos - EMAIL_LOCAL_RUN.match(reversed_window, endpos - at).end()
+            start = -1
+            lo = max(run_start, floor)
+            previous = is_word_char(text[lo - 1]) if lo > 0 else False
+            for i in range(lo, at):
+                current = is_word_char(text[i])
+                if current != previous:
+                    start = i
+                    break
+                previous = current
+
+            if start != -1 and EMAIL_DOMAIN.match(text, at + 1, endpos):
+                match = self.regex.match(text, start, endpos)
+                yield match
+                floor = match.end()
+                at = text.find('@', floor, endpos)
+            else:
+                at = text.find('@', at + 1, endpos)
+
+
+class PageTimeout(Exception):
+    pass
+
+
+@contextmanager
+def page_deadline(seconds):
+    # SIGALRM can only interrupt the main thread, which is where pool workers
+    # run their tasks. Elsewhere the outer future timeout is the only guard.
+    if not seconds or not hasattr(signal, "SIGALRM") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_timeout(signum, frame):
+        raise PageTimeout(f"Page extraction exceeded {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def extract_pdf_pages(data, start, stop, page_timeout=None):
+    # Runs in a worker process: re-open the PDF and extract one page range.
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    results = []
+    for index in range(start, stop):
+        try:
+            with page_deadline(page_timeout):
+                results.append((index, reader.pages[index].extract_text() or "", None))
+        except Exception as e:
+            results.append((index, "", str(e) or type(e).__name__))
+    return results
+
+
+class ArchiveLimitExceeded(Exception):
+    pass
+
+
+SCAN_BUDGET_MESSAGE = "Scan time budget exceeded"
+
+
+class ArchiveBudget:
+    # Shared by every level of one archive so nesting cannot multiply the limits.
+    def __init__(self, max_bytes, max_members, deadline=None):
+        self.bytes_left = max_bytes
+        self.members_left = max_members
+        self.deadline = deadline
+
+    def take_member(self):
+        self.members_left -= 1
+        if self.members_left < 0:
+            raise ArchiveLimitExceeded("Archive member limit reached")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise ArchiveLimitExceeded(SCAN_BUDGET_MESSAGE)
+
+    def take_bytes(self, count):
+        self.bytes_left -= count
+        if self.bytes_left < 0:
+            raise ArchiveLimitExceeded("Archive expanded size limit reached")
+
+
+class BudgetedReader:
+    # Counts decompressed bytes as they are read, so a bomb is stopped after at
+    # most one extra read instead of being inflated in full.
+    def __init__(self, raw, budget, chunk_size=64 * 1024):
+        self.raw = raw
+        self.budget = budget
+        self.chunk_size = chunk_size
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                chunk = self.read(self.chunk_size)
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+        data = self.raw.read(size)
+        self.budget.take_bytes(len(data))
+        return data
+
+
+_worker_engine = None
+
+
+def scan_document(data, filename):
+    # Runs in a worker process: one engine per process, PDF pages extracted inline.
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = DLPEngine(pdf_workers=0, scan_workers=0)
+    errors = []
+    stats = new_scan_stats()
+    detected_counts = _worker_engine.scan_file(io.BytesIO(data), filename, errors, stats)
+    return detected_counts, errors, stats
+
 
 class DLPEngine:
-    def __init__(self):
+    def __init__(self, block_size=STREAM_BLOCK_SIZE, overlap=STREAM_OVERLAP,
+                 pdf_workers=None, pdf_page_timeout=None, pdf_min_pages=None, scan_workers=None):
+        self.block_size = block_size
+        self.overlap = overlap
+
+        # Parallel PDF extraction (0 workers keeps extraction on the request thread)
+        self.pdf_workers = pdf_workers if pdf_workers is not None else int(os.getenv("DLP_PDF_WORKERS", "0"))
+        self.pdf_page_timeout = pdf_page_timeout if pdf_page_timeout is not None else float(os.getenv("DLP_PDF_PAGE_TIMEOUT", "10"))
+        self.pdf_min_pages = pdf_min_pages if pdf_min_pages is not None else int(os.getenv("DLP_PDF_MIN_PAGES", "16"))
+        self._pdf_pool = None
+        self._pool_lock = threading.Lock()
+
+        # Whole-document scanning for batches (0 scans them one by one in-process)
+        self.scan_workers = scan_workers if scan_workers is not None else int(os.getenv("DLP_SCAN_WORKERS", "0"))
+        self._scan_pool = None
+
+        # Archive limits, shared across all nesting levels of one upload
+        self.archive_max_depth = int(os.getenv("DLP_ARCHIVE_MAX_DEPTH", "3"))
+        self.archive_max_bytes = int(os.getenv("DLP_ARCHIVE_MAX_BYTES", 64 * 1024 * 1024))
+        self.archive_max_members = int(os.getenv("DLP_ARCHIVE_MAX_MEMBERS", "1000"))
+
+        # Wall-clock budget per file (0 disables it). A file that runs out is
+        # reported as incomplete and scored at least DLP_INCOMPLETE_RISK_LEVEL.
+        self.scan_time_budget = float(os.getenv("DLP_SCAN_TIME_BUDGET", "30"))
+        self.incomplete_risk_level = os.getenv("DLP_INCOMPLETE_RISK_LEVEL", "High")
+        if self.incomplete_risk_level not in RISK_LEVELS:
+            raise ValueError(f"DLP_INCOMPLETE_RISK_LEVEL must be one of {', '.join(RISK_LEVELS)}")
+
         self.patterns = {
             "Credit Card": r"\b(?:\d[ -]*?){13,16}\b",
             "Aadhaar": r"\b\d{4}\s\d{4}\s\d{4}\b",
@@ -15,29 +314,481 @@ class DLPEngine:
             "Password String": r"(?i)(?:password|passwd|pwd)\s*[:=]\s*['\"]?[\w!@#$%^&*()]+['\"]?"
         }
 
-    def scan_text(self, text):
+        # Candidate families: one cheap pass per family finds the closed windows
+        # a detector can possibly match in, and the full regex only runs there.
+        # Detectors without a family are scanned over the whole text.
+        self.prefilters = {
+            "Credit Card": "digits",
+            "Aadhaar": "digits",
+            "Phone Number": "digits",
+            "PAN Card": "pan",
+            "Email Address": "email"
+        }
+        self.gates = {
+            # Maximal runs of digits/separators long enough for a 10+ char number
+            "digits": re.compile(r"[\d(+][\d\s()+-]{9,}"),
+            "pan": re.compile(r"[A-Z]{5}\d{4}[A-Z]")
+        }
+
+        # Second stage: candidates from these detectors only count if they pass
+        # a checksum / structure check (DLP_VALIDATORS=off counts every candidate).
+        self.validate = os.getenv("DLP_VALIDATORS", "on").lower() not in ("0", "off", "false")
+        self.validators = {
+            "Credit Card": validate_cards,
+            "Aadhaar": validate_aadhaar,
+            "PAN Card": validate_pan
+        } if self.validate else {}
+        self.stage_totals = new_scan_stats()
+        self._stats_lock = threading.Lock()
+
+        self.risk_points = {
+            "Credit Card": 50,
+            "Aadhaar": 40,
+            "PAN Card": 35,
+            "Email Address": 10,
+            "Phone Number": 10,
+            "API Key": 30,
+            "Password String": 40
+        }
+
+        self.compiled = {label: re.compile(pattern) for label, pattern in self.patterns.items()}
+
+        # Characters no match of the detector can contain or look past. A regex
+        # attempt starting before one never reads beyond it, so matches (and
+        # failures) starting before the last one in a buffer are final.
+        self.breaks = {
+            "Credit Card": re.compile(r"[^\d -]"),
+            "Aadhaar": re.compile(r"[^\d\s]"),
+            "PAN Card": re.compile(r"[^A-Z0-9]"),
+            "API Key": re.compile(r"[^0-9a-zA-Z_-]"),
+            "Email Address": re.compile(r"[^A-Za-z0-9._%+|@-]"),
+            "Phone Number": re.compile(r"[^\d ()+-]"),
+            "Password String": re.compile(r"[^\w\s!@#$%^&*()'\":=]")
+        }
+
+        # linear: detectors whose regex can backtrack quadratically run through
+        # an equivalent matcher instead. backtracking: plain re for everything.
+        self.regex_mode = os.getenv("DLP_REGEX_MODE", "linear").lower()
+        self.matchers = dict(self.compiled)
+        if self.regex_mode == "linear":
+            self.matchers["Email Address"] = LinearEmailMatcher(self.compiled["Email Address"])
+
+        # Changes whenever a detector or its weight changes, so cached results
+        # computed under an older rule set are never reused.
+        fingerprint = json.dumps({
+            "patterns": self.patterns,
+            "risk_points": self.risk_points,
+            "validators": {label: fn.__name__ for label, fn in self.validators.items()},
+            "validators_revision": VALIDATORS_REVISION if self.validators else None
+        }, sort_keys=True)
+        self.pattern_version = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+    def _email_windows(self, text):
+        # Expand each '@' to the maximal run of email characters around it.
+        windows = []
+        n = len(text)
+        reversed_text = None
+        i = text.find('@')
+        while i != -1:
+            if reversed_text is None:
+                reversed_text = text[::-1]
+            start = n - EMAIL_RUN.match(reversed_text, n - 1 - i).end()
+            end = EMAIL_RUN.match(text, i).end()
+            windows.append((start, end))
+            i = text.find('@', end)
+        return windows
+
+    def _candidate_windows(self, text):
+        windows = {family: [(m.start(), m.end()) for m in gate.finditer(text)]
+                   for family, gate in self.gates.items()}
+        windows["email"] = self._email_windows(text)
+        return windows
+
+    def _final_limit(self, label, text, pos, limit):
+        # -> offset before which the detector's matches cannot change once more
+        # text is appended. Searched backwards in growing steps, since a break
+        # is usually a few characters from the end.
+        breaks = self.breaks.get(label)
+        if breaks is None:
+            return limit
+        n = len(text)
+        floor = max(pos, n - STREAM_MAX_HOLD)
+        size = 64
+        while True:
+            start = max(floor, n - size)
+            found = breaks.search(text[start:][::-1])
+            if found is not None:
+                return min(limit, n - 1 - found.start())
+            if start == floor:
+                # Nothing is final yet; past STREAM_MAX_HOLD, give up and split
+                return pos if floor == pos else limit
+            size *= 4
+
+    def _scan_buffer(self, text, resume, limit, detected_counts, stats, final=True):
+        # Count matches starting before `limit`. `resume` holds, per detector, the
+        # offset where its next match may start (end of the previous match), so
+        # a match is never counted twice when buffers overlap. When more text
+        # follows (final=False) a detector stops at its last break character,
+        # and a match running into the end of the buffer is left for the next
+        # one unless it is longer than STREAM_MAX_HOLD.
+        started = time.perf_counter()
+        validation_seconds = 0.0
+        n = len(text)
+        windows = self._candidate_windows(text)
+
+        for label, regex in self.matchers.items():
+            family = self.prefilters.get(label)
+            if family is None:
+                spans = [(0, n)]
+            else:
+                # Windows end on a character no match can contain, so including it
+                # in endpos keeps \b at the window edge identical to a full scan.
+                spans = [(start, end + 1 if end < n else end) for start, end in windows[family]]
+
+            validator = self.validators.get(label)
+            candidates = []
+            pos = resume.get(label, 0)
+            label_limit = limit if final else self._final_limit(label, text, pos, limit)
+            held = None
+            count = 0
+            for start, end in spans:
+                if end <= pos or held is not None:
+                    continue
+                for match in regex.finditer(text, max(start, pos), end):
+                    if match.start() >= label_limit:
+                        break
+                    if not final and match.end() >= n and n - match.start() <= STREAM_MAX_HOLD:
+                        held = match.start()
+                        break
+                    if validator:
+                        candidates.append(match.group())
+                    else:
+                        count += 1
+                    pos = match.end()
+            resume[label] = held if held is not None else max(pos, label_limit)
+
+            if validator:
+                validation_started = time.perf_counter()
+                accepted = sum(validator(candidates)) if candidates else 0
+                validation_seconds += time.perf_counter() - validation_started
+                stats["candidates"][label] = stats["candidates"].get(label, 0) + len(candidates)
+                stats["rejected"][label] = stats["rejected"].get(label, 0) + len(candidates) - accepted
+                count = accepted
+            else:
+                stats["candidates"][label] = stats["candidates"].get(label, 0) + count
+
+            stats["accepted"][label] = stats["accepted"].get(label, 0) + count
+            if count:
+                detected_counts[label] = detected_counts.get(label, 0) + count
+
+        stats["validation_seconds"] += validation_seconds
+        stats["candidate_seconds"] += time.perf_counter() - started - validation_seconds
+        return detected_counts
+
+    def is_incomplete(self, errors):
+        return any(error.get("incomplete") for error in errors)
+
+    def score(self, detected_counts, incomplete=False):
+        total_risk_score = 0
+        for label, count in detected_counts.items():
+            points = self.risk_points.get(label, 10)
+            total_risk_score += points * count
+
+        risk_level = "Low"
+        if total_risk_score > 100: risk_level = "Critical"
+        elif total_risk_score > 60: risk_level = "High"
+        elif total_risk_score > 20: risk_level = "Medium"
+
+        # Fail closed: content that was never scanned cannot be assumed clean
+        if incomplete and RISK_LEVELS.index(risk_level) < RISK_LEVELS.index(self.incomplete_risk_level):
+            risk_level = self.incomplete_risk_level
+        return total_risk_score, risk_level
+
+    def _record_stats(self, stats, caller_stats=None):
+        with self._stats_lock:
+            merge_stats(self.stage_totals, stats)
+        if caller_stats is not None:
+            merge_stats(caller_stats, stats)
+
+    def stage_stats(self):
+        with self._stats_lock:
+            totals = merge_stats(new_scan_stats(), self.stage_totals)
+        totals["candidate_seconds"] = round(totals["candidate_seconds"], 4)
+        totals["validation_seconds"] = round(totals["validation_seconds"], 4)
+        return totals
+
+    def scan_text(self, text, stats=None):
+        local_stats = new_scan_stats()
+        detected_counts = self._scan_buffer(text, {}, len(text), {}, local_stats)
+        self._record_stats(local_stats, stats)
+        return detected_counts
+
+    def _deadline(self):
+        return time.monotonic() + self.scan_time_budget if self.scan_time_budget > 0 else None
+
+    def scan_stream(self, chunks, stats=None, errors=None, deadline=None):
+        # Past `deadline` the rest of the stream is left unread and an
+        # incomplete marker is appended to `errors`.
+        local_stats = new_scan_stats()
         detected_counts = {}
-        for label, pattern in self.patterns.items():
-            matches = re.findall(pattern, text)
-            if matches:
-                detected_counts[label] = len(matches)
+        resume = {}
+        buffer = ""
+        pending = []
+        pending_size = 0
+
+        for chunk in chunks:
+            if deadline is not None and time.monotonic() > deadline:
+                if errors is not None:
+                    errors.append({"error": SCAN_BUDGET_MESSAGE, "incomplete": True})
+                break
+            if not chunk:
+                continue
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size < self.block_size:
+                continue
+
+            buffer += "".join(pending)
+            pending = []
+            pending_size = 0
+
+            limit = len(buffer) - self.overlap
+            if limit <= 0:
+                continue
+            self._scan_buffer(buffer, resume, limit, detected_counts, local_stats, final=False)
+
+            # Keep what the detectors still have to scan plus one character of
+            # left context for \b.
+            drop = max(0, min(resume.values()) - 1)
+            buffer = buffer[drop:]
+            resume = {label: pos - drop for label, pos in resume.items()}
+
+        buffer += "".join(pending)
+        self._scan_buffer(buffer, resume, len(buffer), detected_counts, local_stats)
+        self._record_stats(local_stats, stats)
         return detected_counts
 
-    def extract_text(self, file_stream, filename):
-        text = ""
+    def _get_pdf_pool(self):
+        with self._pool_lock:
+            if self._pdf_pool is None:
+                self._pdf_pool = ProcessPoolExecutor(max_workers=self.pdf_workers)
+            return self._pdf_pool
+
+    def _reset_pdf_pool(self):
+        with self._pool_lock:
+            if self._pdf_pool is not None:
+                self._pdf_pool.shutdown(wait=False, cancel_futures=True)
+                self._pdf_pool = None
+
+    def _iter_pdf_pages(self, file_stream, errors):
+        reader = PyPDF2.PdfReader(file_stream)
+        page_count = len(reader.pages)
+
+        if self.pdf_workers <= 0 or page_count < self.pdf_min_pages:
+            for index, page in enumerate(reader.pages):
+                try:
+                    yield page.extract_text() or ""
+                except Exception as e:
+                    errors.append({"page": index + 1, "error": str(e) or type(e).__name__})
+            return
+
+        file_stream.seek(0)
+        data = file_stream.read()
+        shard_size = -(-page_count // self.pdf_workers)
+        shards = [(start, min(start + shard_size, page_count))
+                  for start in range(0, page_count, shard_size)]
+
+        pool = self._get_pdf_pool()
+        futures = [pool.submit(extract_pdf_pages, data, start, stop, self.pdf_page_timeout)
+                   for start, stop in shards]
+
+        # Consume shards in page order; a shard that hangs or crashes its worker
+        # is reported page by page instead of failing the whole file.
+        for (start, stop), future in zip(shards, futures):
+            try:
+                results = future.result(timeout=self.pdf_page_timeout * (stop - start) + 5)
+            except (FutureTimeoutError, BrokenProcessPool) as e:
+                future.cancel()
+                self._reset_pdf_pool()
+                reason = "Page extraction timed out" if isinstance(e, FutureTimeoutError) else "Extraction worker crashed"
+                results = [(index, "", reason) for index in range(start, stop)]
+            for index, text, error in results:
+                if error:
+                    errors.append({"page": index + 1, "error": error})
+                else:
+                    yield text
+
+    def scan_many(self, documents, stats=None):
+        # documents: [(bytes, filename)] -> [(detected_counts, errors)] in the same order
+        if self.scan_workers <= 0 or len(documents) < 2:
+            results = []
+            for data, filename in documents:
+                errors = []
+                results.append((self.scan_file(io.BytesIO(data), filename, errors, stats), errors))
+            return results
+
+        pool = self._get_scan_pool()
+        try:
+            results = []
+            for detected_counts, errors, document_stats in pool.map(scan_document, *zip(*documents)):
+                self._record_stats(document_stats, stats)
+                results.append((detected_counts, errors))
+            return results
+        except BrokenProcessPool:
+            with self._pool_lock:
+                self._scan_pool = None
+            raise
+
+    def _get_scan_pool(self):
+        with self._pool_lock:
+            if self._scan_pool is None:
+                self._scan_pool = ProcessPoolExecutor(max_workers=self.scan_workers)
+            return self._scan_pool
+
+    # ==========================
+    # ARCHIVES
+    # ==========================
+    def _open_tar(self, file_stream, filename, budget):
+        name = filename.lower()
+        if name.endswith(('.tar.gz', '.tgz')):
+            raw = gzip.GzipFile(fileobj=file_stream)
+        elif name.endswith(('.tar.bz2', '.tbz2')):
+            raw = bz2.BZ2File(file_stream)
+        elif name.endswith(('.tar.xz', '.txz')):
+            raw = lzma.LZMAFile(file_stream)
+        else:
+            raw = file_stream
+        # Sequential stream mode: members are read in order, nothing is seeked or
+        # written to disk, and every decompressed byte counts against the budget.
+        return tarfile.open(fileobj=BudgetedReader(raw, budget), mode='r|')
+
+    def _scan_member(self, stream, name, detected_counts, errors, depth, budget, pending, stats):
+        kind = self.extractor_for(name)
+        if kind == 'none':
+            return
+
+        if kind in ('zip', 'tar', 'gz'):
+            if depth >= self.archive_max_depth:
+                errors.append({"member": name, "error": "Archive nesting limit reached"})
+                return
+            # Zip needs random access; tar and gzip keep streaming.
+            inner = io.BytesIO(stream.read()) if kind == 'zip' else stream
+            self._scan_archive(inner, name, detected_counts, errors, depth + 1, budget, pending, stats)
+            return
+
+        if kind in ('pdf', 'docx') and self.scan_workers > 0:
+            # Heavy extractors run on the scan pool while later members are read
+            pending.append((name, self._get_scan_pool().submit(scan_document, stream.read(), name)))
+            return
+
+        member_errors = []
+        if kind in ('pdf', 'docx'):
+            stream = io.BytesIO(stream.read())
+        counts = self.scan_stream(self.iter_text(stream, name, member_errors), stats, member_errors, budget.deadline)
+        merge_counts(detected_counts, counts)
+        errors.extend(dict(error, member=name) for error in member_errors)
+
+    def _scan_archive(self, file_stream, filename, detected_counts, errors, depth, budget, pending, stats):
+        kind = self.extractor_for(filename)
+        if kind == 'zip':
+            with zipfile.ZipFile(file_stream) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    budget.take_member()
+                    with archive.open(info) as member:
+                        self._scan_member(BudgetedReader(member, budget), f"{filename}/{info.filename}",
+                                          detected_counts, errors, depth, budget, pending, stats)
+        elif kind == 'tar':
+            with self._open_tar(file_stream, filename, budget) as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    budget.take_member()
+                    self._scan_member(archive.extractfile(info), f"{filename}/{info.name}",
+                                      detected_counts, errors, depth, budget, pending, stats)
+        else:
+            # Single gzip member: scan it under its inner name (report.txt.gz -> report.txt)
+            budget.take_member()
+            inner_name = filename[:-3] if filename.lower().endswith('.gz') else filename
+            member = BudgetedReader(gzip.GzipFile(fileobj=file_stream), budget)
+            self._scan_member(member, inner_name, detected_counts, errors, depth, budget, pending, stats)
+
+    def scan_archive(self, file_stream, filename, errors=None, stats=None, deadline=None):
+        if errors is None:
+            errors = []
+        detected_counts = {}
+        pending = []
+        budget = ArchiveBudget(self.archive_max_bytes, self.archive_max_members, deadline)
+        try:
+            self._scan_archive(file_stream, filename, detected_counts, errors, 1, budget, pending, stats)
+        except ArchiveLimitExceeded as e:
+            # Members past the limit were never looked at
+            errors.append({"member": filename, "error": str(e), "incomplete": True})
+        except (zipfile.BadZipFile, tarfile.TarError, OSError, EOFError, lzma.LZMAError) as e:
+            # Whatever could not be read was never scanned either: fail closed
+            errors.append({"member": filename, "error": f"Unreadable archive: {e}", "incomplete": True})
+
+        for name, future in pending:
+            try:
+                timeout = max(0, deadline - time.monotonic()) if deadline is not None else None
+                counts, member_errors, member_stats = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                errors.append({"member": name, "error": SCAN_BUDGET_MESSAGE, "incomplete": True})
+                continue
+            except Exception as e:
+                errors.append({"member": name, "error": str(e) or type(e).__name__, "incomplete": True})
+                continue
+            self._record_stats(member_stats, stats)
+            merge_counts(detected_counts, counts)
+            errors.extend(dict(error, member=name) for error in member_errors)
+        return detected_counts
+
+    def extractor_for(self, filename):
         filename = filename.lower()
+        if filename.endswith('.zip'):
+            return 'zip'
+        if filename.endswith(('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')):
+            return 'tar'
+        if filename.endswith('.gz'):
+            return 'gz'
         if filename.endswith('.txt'):
-            text = file_stream.read().decode('utf-8', errors='ignore')
+            return 'txt'
+        if filename.endswith('.pdf'):
+            return 'pdf'
+        if filename.endswith(('.doc', '.docx')):
+            return 'docx'
+        return 'none'
+
+    def iter_text(self, file_stream, filename, errors=None):
+        if errors is None:
+            errors = []
+        filename = filename.lower()
+        if filename.endswith('.txt'):
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+            while True:
+                block = file_stream.read(self.block_size)
+                if not block:
+                    break
+                yield decoder.decode(block)
+            yield decoder.decode(b"", final=True)
         elif filename.endswith('.pdf'):
-            reader = PyPDF2.PdfReader(file_stream)
-            for page in reader.pages:
-                text += page.extract_text()
+            yield from self._iter_pdf_pages(file_stream, errors)
         elif filename.endswith(('.doc', '.docx')):
             doc = Document(file_stream)
             for para in doc.paragraphs:
-                text += para.text + "\n"
-        return text
+                yield para.text + "\n"
+
+    def extract_text(self, file_stream, filename, errors=None):
+        return "".join(self.iter_text(file_stream, filename, errors))
 
-    def scan_file(self, file_stream, filename):
-        text = self.extract_text(file_stream, filename)
-        return self.scan_text(text)
+    def scan_file(self, file_stream, filename, errors=None, stats=None):
+        # Pages or archive members that fail to extract are skipped and appended
+        # to `errors`; running out of time budget adds an incomplete marker.
+        if errors is None:
+            errors = []
+        deadline = self._deadline()
+        if self.extractor_for(filename) in ('zip', 'tar', 'gz'):
+            return self.scan_archive(file_stream, filename, errors, stats, deadline)
+        return self.scan_stream(self.iter_text(file_stream, filename, errors), stats, errors, deadline)
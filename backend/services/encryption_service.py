@@ -1,10 +1,90 @@
 import os
+import io
+import hmac
 import base64
+import hashlib
+import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# ==========================
+# SEGMENTED FILE FORMAT
+# ==========================
+# header: magic | version | segment size | salt | nonce prefix
+# body:   AES-256-GCM(segment) || tag, one per segment_size plaintext bytes
+# Each segment is authenticated on its own, with the header as associated data
+# and the segment index plus a last-segment flag in the nonce, so segments
+# cannot be reordered, truncated or spliced between files.
+SEGMENT_MAGIC = b"DLPSEG"
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct(">6sBI16s7s")
+SEGMENT_TAG_SIZE = 16
+DEFAULT_SEGMENT_SIZE = 1024 * 1024
+
+
+def _read_exact(stream, size):
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+class SegmentedFile:
+    def __init__(self, key, segment_size, salt, nonce_prefix):
+        self.segment_size = segment_size
+        self.salt = salt
+        self.nonce_prefix = nonce_prefix
+        self.header = SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, segment_size, salt, nonce_prefix)
+        # Per-file key so nonces never repeat across files under the master key
+        file_key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            info=b"dlp-segmented-file-v1"
+        ).derive(key)
+        self.aead = AESGCM(file_key)
+
+    @classmethod
+    def create(cls, key, segment_size):
+        return cls(key, segment_size, os.urandom(16), os.urandom(7))
+
+    @classmethod
+    def from_header(cls, key, header):
+        magic, version, segment_size, salt, nonce_prefix = SEGMENT_HEADER.unpack(header)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            raise ValueError("Not a segmented encrypted file")
+        return cls(key, segment_size, salt, nonce_prefix)
+
+    def _nonce(self, index, last):
+        return self.nonce_prefix + struct.pack(">IB", index, 1 if last else 0)
+
+    def encrypt_segment(self, index, data, last):
+        return self.aead.encrypt(self._nonce(index, last), data, self.header)
+
+    def decrypt_segment(self, index, data, last):
+        return self.aead.decrypt(self._nonce(index, last), data, self.header)
+
+    def segment_count(self, body_size):
+        stored = self.segment_size + SEGMENT_TAG_SIZE
+        return max(1, -(-body_size // stored))
+
+    def plaintext_size(self, body_size):
+        return body_size - self.segment_count(body_size) * SEGMENT_TAG_SIZE
+
+
 class EncryptionService:
     def __init__(self):
         # Load environment variables just in case
@@ -46,6 +126,30 @@ class EncryptionService:
             self.cipher = Fernet(self.key)
             print(f"EMERGENCY: Encryption re-initialized due to error: {e}")
 
+        # Segmented files use AES-256-GCM under the 32 bytes behind the Fernet key.
+        # Existing single-token Fernet files stay readable.
+        self.segment_key = base64.urlsafe_b64decode(self.key)
+        # Blob store names: keyed, so a stored blob doesn't reveal a plain hash of its content
+        self.content_key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b"dlp-content-id-v1"
+        ).derive(self.segment_key)
+        self.segment_size = int(os.getenv('ENCRYPTION_SEGMENT_SIZE', DEFAULT_SEGMENT_SIZE))
+        self.workers = int(os.getenv('ENCRYPTION_WORKERS', '1'))
+        self.file_format = os.getenv('ENCRYPTION_FILE_FORMAT', 'segmented').lower()
+        # off: rely on the OS, file: fsync the data, full: also fsync the directory entry
+        self.fsync_policy = os.getenv('ENCRYPTION_FSYNC', 'off').lower()
+
+    def content_hasher(self):
+        return hmac.new(self.content_key, digestmod=hashlib.sha256)
+
+    def content_id(self, data):
+        hasher = self.content_hasher()
+        hasher.update(data)
+        return hasher.hexdigest()
+
     def encrypt(self, data):
         if isinstance(data, str):
             data = data.encode()
@@ -54,17 +158,138 @@ class EncryptionService:
     def decrypt(self, encrypted_data):
         return self.cipher.decrypt(encrypted_data).decode()
 
+    # ==========================
+    # FILE ENCRYPTION
+    # ==========================
+    def _map_segments(self, func, items):
+        # Preserves order; with workers > 1 a bounded window of segments is in
+        # flight at once so memory stays at a few segments.
+        if self.workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+
+        window = self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = []
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+
+    def _iter_plain_segments(self, in_stream, segment_size):
+        # Look one segment ahead so the final one can be flagged as last.
+        index = 0
+        current = _read_exact(in_stream, segment_size)
+        while True:
+            following = _read_exact(in_stream, segment_size) if len(current) == segment_size else b""
+            last = not following
+            yield index, current, last
+            if last:
+                return
+            index += 1
+            current = following
+
+    def encrypt_stream(self, in_stream, out_stream):
+        segmented = SegmentedFile.create(self.segment_key, self.segment_size)
+        out_stream.write(segmented.header)
+        encrypt = lambda item: segmented.encrypt_segment(*item)
+        for encrypted_segment in self._map_segments(encrypt, self._iter_plain_segments(in_stream, self.segment_size)):
+            out_stream.write(encrypted_segment)
+
+    def iter_decrypt_stream(self, in_stream):
+        header = _read_exact(in_stream, SEGMENT_HEADER.size)
+        if not header.startswith(SEGMENT_MAGIC):
+            # Legacy single-token Fernet file
+            yield self.cipher.decrypt(header + in_stream.read())
+            return
+
+        segmented = SegmentedFile.from_header(self.segment_key, header)
+        stored_size = segmented.segment_size + SEGMENT_TAG_SIZE
+        decrypt = lambda item: segmented.decrypt_segment(*item)
+        for plain_segment in self._map_segments(decrypt, self._iter_plain_segments(in_stream, stored_size)):
+            yield plain_segment
+
+    def is_segmented(self, encrypted_path):
+        with open(encrypted_path, 'rb') as f:
+            return f.read(len(SEGMENT_MAGIC)) == SEGMENT_MAGIC
+
+    def _atomic_write(self, output_path, write):
+        # Write next to the destination and rename into place, so readers never
+        # see a partial file and a failed write leaves nothing behind.
+        directory = os.path.dirname(output_path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f_out:
+                write(f_out)
+                if self.fsync_policy in ('file', 'full'):
+                    f_out.flush()
+                    os.fsync(f_out.fileno())
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        if self.fsync_policy == 'full' and hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(directory, os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def encrypt_stream_to_file(self, in_stream, output_path):
+        if self.file_format == 'fernet':
+            self._atomic_write(output_path, lambda f_out: f_out.write(self.cipher.encrypt(in_stream.read())))
+        else:
+            self._atomic_write(output_path, lambda f_out: self.encrypt_stream(in_stream, f_out))
+
     def encrypt_file(self, file_path, output_path):
-        with open(file_path, 'rb') as f:
-            data = f.read()
-        
-        encrypted_data = self.cipher.encrypt(data)
-        
-        with open(output_path, 'wb') as f:
-            f.write(encrypted_data)
+        with open(file_path, 'rb') as f_in:
+            self.encrypt_stream_to_file(f_in, output_path)
 
     def decrypt_file(self, encrypted_path):
         with open(encrypted_path, 'rb') as f:
-            encrypted_data = f.read()
-            
-        return self.cipher.decrypt(encrypted_data)
+            return b"".join(self.iter_decrypt_stream(f))
+
+    def decrypt_file_to(self, encrypted_path, out_stream):
+        with open(encrypted_path, 'rb') as f:
+            for chunk in self.iter_decrypt_stream(f):
+                out_stream.write(chunk)
+
+    def decrypt_range(self, encrypted_path, offset, length):
+        # Only the segments overlapping [offset, offset + length) are read and authenticated.
+        if offset < 0 or length < 0:
+            raise ValueError("Offset and length must be non-negative")
+
+        with open(encrypted_path, 'rb') as f:
+            header = _read_exact(f, SEGMENT_HEADER.size)
+            if not header.startswith(SEGMENT_MAGIC):
+                data = self.cipher.decrypt(header + f.read())
+                return data[offset:offset + length]
+
+            segmented = SegmentedFile.from_header(self.segment_key, header)
+            body_size = os.fstat(f.fileno()).st_size - SEGMENT_HEADER.size
+            total_segments = segmented.segment_count(body_size)
+            end = min(offset + length, segmented.plaintext_size(body_size))
+            if offset >= end:
+                return b""
+
+            segment_size = segmented.segment_size
+            stored_size = segment_size + SEGMENT_TAG_SIZE
+            first = offset // segment_size
+            last = (end - 1) // segment_size
+
+            f.seek(SEGMENT_HEADER.size + first * stored_size)
+            parts = []
+            for index in range(first, last + 1):
+                stored = _read_exact(f, stored_size)
+                parts.append(segmented.decrypt_segment(index, stored, index == total_segments - 1))
+
+        data = b"".join(parts)
+        start = offset - first * segment_size
+        return data[start:start + (end - offset)]
@@ -0,0 +1,135 @@
+import io
+import os
+import csv
+import json
+import zlib
+from sqlalchemy import select, or_
+from extensions import db
+from models import File, Detection, Log, AnomalyLog
+
+# Exports are read in chunks of EXPORT_CHUNK_ROWS in (timestamp, id) order,
+# followed by the rows without a timestamp in id order; those are left out
+# when a date range is given. Each chunk is fetched with a server-side
+# cursor, encoded, and its transaction ended before anything is sent, so
+# memory is bounded by one chunk and a slow client never keeps a transaction
+# (or a pooled connection) open while it reads.
+
+EXPORTS = {
+    'logs': (Log, Log.timestamp, [
+        Log.id, Log.user_id, Log.action, Log.details, Log.ip_address, Log.timestamp
+    ]),
+    'anomalies': (AnomalyLog, AnomalyLog.timestamp, [
+        AnomalyLog.id, AnomalyLog.user_id, AnomalyLog.anomaly_type, AnomalyLog.severity,
+        AnomalyLog.details, AnomalyLog.timestamp
+    ]),
+    'files': (File, File.upload_time, [
+        File.id, File.user_id, File.filename, File.is_blocked, File.filesize,
+        File.risk_score, File.risk_level, File.upload_time
+    ])
+}
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class ExportService:
+    def __init__(self, chunk_rows=None):
+        self.chunk_rows = chunk_rows if chunk_rows is not None else int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+    def columns(self, name):
+        names = [column.key for column in EXPORTS[name][2]]
+        return names + ['detections'] if name == 'files' else names
+
+    def _chunk(self, name, start, end, after):
+        model, time_column, columns = EXPORTS[name]
+        query = select(*columns).where(time_column.isnot(None))
+        if start:
+            query = query.where(time_column >= start)
+        if end:
+            query = query.where(time_column < end)
+        if after:
+            # Same range-friendly form as utils.pagination, ascending
+            timestamp, row_id = after
+            query = query.where(time_column >= timestamp, or_(time_column > timestamp, model.id > row_id))
+        return self._fetch(query.order_by(time_column, model.id))
+
+    def _undated_chunk(self, name, after_id):
+        model, time_column, columns = EXPORTS[name]
+        query = select(*columns).where(time_column.is_(None))
+        if after_id:
+            query = query.where(model.id > after_id)
+        return self._fetch(query.order_by(model.id))
+
+    def _fetch(self, query):
+        query = query.limit(self.chunk_rows)
+        result = db.session.execute(query.execution_options(stream_results=True, yield_per=self.chunk_rows))
+        return [dict(row._mapping) for row in result]
+
+    def _add_detections(self, rows):
+        found = {}
+        for file_id, detection_type, count in db.session.execute(
+            select(Detection.file_id, Detection.detection_type, Detection.count)
+            .where(Detection.file_id.in_([row['id'] for row in rows]))
+            .order_by(Detection.file_id, Detection.id)
+        ):
+            found.setdefault(file_id, []).append(f"{detection_type}:{count}")
+        for row in rows:
+            row['detections'] = ";".join(found.get(row['id'], []))
+
+    def _read(self, name, fetch, next_after):
+        after = None
+        while True:
+            try:
+                rows = fetch(after)
+                if rows and name == 'files':
+                    self._add_detections(rows)
+            finally:
+                db.session.rollback()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.chunk_rows:
+                return
+            after = next_after(rows[-1])
+
+    def rows(self, name, start=None, end=None):
+        # Yields lists of row dicts, one list per chunk
+        time_key = EXPORTS[name][1].key
+        yield from self._read(name, lambda after: self._chunk(name, start, end, after),
+                              lambda row: (row[time_key], row['id']))
+        if not start and not end:
+            yield from self._read(name, lambda after: self._undated_chunk(name, after),
+                                  lambda row: row['id'])
+
+    def encode(self, name, fmt, start=None, end=None, compress=False):
+        # Generator of response bytes
+        compressor = zlib.compressobj(wbits=31) if compress else None  # gzip container
+        columns = self.columns(name)
+
+        def chunks():
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                yield buffer.getvalue()
+                for rows in self.rows(name, start, end):
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows([export_value(row[column]) for column in columns] for row in rows)
+                    yield buffer.getvalue()
+            else:
+                for rows in self.rows(name, start, end):
+                    yield "".join(json.dumps({column: export_value(row[column]) for column in columns}) + "\n"
+                                  for row in rows)
+
+        for text in chunks():
+            data = text.encode()
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
@@ -0,0 +1,56 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from extensions import db
+from models import UploadJob
+
+class JobService:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv("UPLOAD_WORKERS", "2"))
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="upload-job")
+        return self._executor
+
+    def submit(self, app, fn, *args):
+        def run():
+            with app.app_context():
+                try:
+                    fn(*args)
+                finally:
+                    db.session.remove()
+        return self._get_executor().submit(run)
+
+    def update(self, job_id, **fields):
+        # Written on its own connection so progress is visible to pollers in
+        # other workers without committing the job's half-finished session.
+        fields['updated_at'] = datetime.utcnow()
+        with db.engine.begin() as conn:
+            conn.execute(UploadJob.__table__.update().where(UploadJob.__table__.c.id == job_id).values(**fields))
+
+    def finish(self, job_id, body, status_code):
+        self.update(
+            job_id,
+            status="completed" if status_code < 400 else "failed",
+            stage="done",
+            progress=100,
+            http_status=status_code,
+            result=json.dumps(body)
+        )
+
+    def serialize(self, job):
+        return {
+            "job_id": job.id,
+            "filename": job.filename,
+            "filesize": job.filesize,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": job.progress,
+            "http_status": job.http_status,
+            "result": json.loads(job.result) if job.result else None,
+            "created_at": job.created_at.isoformat(),
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None
+        }
@@ -0,0 +1,63 @@
+import os
+import hashlib
+from datetime import datetime
+from flask import current_app
+from services.activity_counter_service import counter_backend_from_env, database_namespace, minute_of
+
+
+# ==========================
+# LOGIN THROTTLE
+# ==========================
+# Failed sign-ins per client IP and per identifier (username or email) over a
+# sliding window of minute buckets, kept in the activity counter backend so
+# every worker sees the same counts. Requests over either limit are refused
+# before the user lookup and the bcrypt check.
+class LoginThrottleService:
+    def __init__(self, backend=None):
+        self.window_minutes = int(os.getenv("LOGIN_THROTTLE_WINDOW_MINUTES", "15"))
+        self.max_identifier_failures = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+        self.max_ip_failures = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+        self.backend = backend if backend is not None else counter_backend_from_env((self.window_minutes + 1) * 60)
+
+    def _keys(self, ip_address, identifier):
+        namespace = database_namespace()
+        # Identifiers are hashed so the backend holds no usernames or emails
+        digest = hashlib.sha1(identifier.strip().lower().encode()).hexdigest()
+        return f"dlp:{namespace}:login_fail:ip:{ip_address}", f"dlp:{namespace}:login_fail:id:{digest}"
+
+    def failures(self, ip_address, identifier):
+        # -> (failures from this IP, failures for this identifier) in the window
+        ip_key, identifier_key = self._keys(ip_address, identifier)
+        since_minute = minute_of(datetime.utcnow()) - self.window_minutes + 1
+        try:
+            return self.backend.total(ip_key, since_minute), self.backend.total(identifier_key, since_minute)
+        except Exception as e:
+            current_app.logger.warning(f"Login throttle unavailable: {e}")
+            return 0, 0
+
+    def is_blocked(self, ip_address, identifier):
+        ip_failures, identifier_failures = self.failures(ip_address, identifier)
+        return ip_failures >= self.max_ip_failures or identifier_failures >= self.max_identifier_failures
+
+    def retry_after(self):
+        # Worst case, until the oldest failure leaves the window
+        return self.window_minutes * 60
+
+    def record_failure(self, ip_address, identifier):
+        # -> counts including this failure
+        ip_key, identifier_key = self._keys(ip_address, identifier)
+        try:
+            now_minute = minute_of(datetime.utcnow())
+            self.backend.incr(ip_key, now_minute, 1)
+            self.backend.incr(identifier_key, now_minute, 1)
+        except Exception as e:
+            current_app.logger.warning(f"Login throttle update failed: {e}")
+        return self.failures(ip_address, identifier)
+
+    def reset(self, identifier):
+        # A successful sign-in clears the identifier's failures (not the IP's)
+        _, identifier_key = self._keys("", identifier)
+        try:
+            self.backend.replace(identifier_key, {})
+        except Exception as e:
+            current_app.logger.warning(f"Login throttle reset failed: {e}")
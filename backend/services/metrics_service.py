@@ -0,0 +1,100 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# Multi-process servers (gunicorn etc.): set PROMETHEUS_MULTIPROC_DIR to an
+# empty, writable directory before the workers start, and wipe it on restart.
+# Every process then writes its samples there and /api/metrics sums them, so
+# any worker can answer a scrape.
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class MetricsService:
+    def __init__(self):
+        self.request_count = Counter(
+            'dlp_http_requests_total', 'HTTP requests by endpoint, method and status',
+            ['endpoint', 'method', 'status']
+        )
+        self.request_seconds = Histogram(
+            'dlp_http_request_seconds', 'HTTP request latency by endpoint',
+            ['endpoint'], buckets=STAGE_BUCKETS
+        )
+        self.db_queries = Histogram(
+            'dlp_db_queries_per_request', 'SQL statements executed per request',
+            ['endpoint'], buckets=QUERY_BUCKETS
+        )
+        self.stage_seconds = Histogram(
+            'dlp_upload_stage_seconds', 'Time spent in each upload pipeline stage',
+            ['stage'], buckets=STAGE_BUCKETS
+        )
+        self.upload_size = Histogram(
+            'dlp_upload_size_bytes', 'Size of uploaded files',
+            buckets=SIZE_BUCKETS
+        )
+        self.scan_cache = Counter(
+            'dlp_scan_cache_lookups_total', 'Scan cache lookups by outcome',
+            ['result']
+        )
+        self.token = os.getenv('METRICS_TOKEN')
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if not event.contains(Engine, 'before_cursor_execute', self._count_query):
+            event.listen(Engine, 'before_cursor_execute', self._count_query)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            self.request_count.labels(endpoint, request.method, response.status_code).inc()
+            self.request_seconds.labels(endpoint).observe(time.perf_counter() - started)
+            self.db_queries.labels(endpoint).observe(g.pop('metrics_queries', 0))
+        return response
+
+    def _count_query(self, conn, cursor, statement, parameters, context, executemany):
+        # g lives on the app context, so background jobs count into their own
+        # context and are never observed; only requests are reported.
+        if has_app_context() and 'metrics_queries' in g:
+            g.metrics_queries += 1
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.labels(name).observe(time.perf_counter() - started)
+
+    def observe_scan(self, seconds, stats):
+        # Split one scan's wall time using the engine's own stage timings;
+        # whatever is left over went to reading and extracting the documents.
+        regex_seconds = stats['candidate_seconds']
+        validation_seconds = stats['validation_seconds']
+        self.stage_seconds.labels('extraction').observe(max(0.0, seconds - regex_seconds - validation_seconds))
+        self.stage_seconds.labels('regex_scan').observe(regex_seconds)
+        self.stage_seconds.labels('validation').observe(validation_seconds)
+
+    def authorized(self, header):
+        return not self.token or header == f"Bearer {self.token}"
+
+    def render(self):
+        if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry), CONTENT_TYPE_LATEST
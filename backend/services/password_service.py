@@ -0,0 +1,47 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from extensions import bcrypt
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+# ==========================
+# BCRYPT WORKER POOL
+# ==========================
+# bcrypt releases the GIL while hashing, so running it on a few dedicated
+# threads caps how many cores a login storm can take; request threads just
+# wait on the result. Beyond BCRYPT_WORKERS running and BCRYPT_MAX_PENDING
+# queued hashes, new requests are turned away instead of piling up.
+class PasswordService:
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv("BCRYPT_WORKERS", "2"))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("BCRYPT_MAX_PENDING", "16"))
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolBusy("Too many sign-in requests, please try again shortly")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def check(self, password_hash, password):
+        return self._run(bcrypt.check_password_hash, password_hash, password)
+
+    def generate(self, password):
+        return self._run(bcrypt.generate_password_hash, password).decode("utf-8")
@@ -0,0 +1,111 @@
+import time
+import threading
+from functools import wraps
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, ProgrammingError, IntegrityError, DataError, NotSupportedError
+
+# Errors caused by the statement itself; they would fail on the primary too
+QUERY_ERRORS = (ProgrammingError, IntegrityError, DataError, NotSupportedError)
+
+
+# ==========================
+# READ REPLICA ROUTING
+# ==========================
+# Routes decorated with replicas.read_only run their queries on the "replica"
+# bind (DATABASE_REPLICA_URL), keeping the heavy analytics off the primary
+# that takes the upload writes. Anything flushed from the session still goes
+# to the primary.
+#
+# When the replica fails for reasons other than the query itself (cannot
+# connect, connection lost, missing or corrupt database), the request is run
+# again on the primary and the replica is skipped for REPLICA_RETRY_SECONDS.
+# The replica may lag the primary slightly, which is fine for dashboards but
+# not for anything that must read its own writes.
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('db_replica'):
+            engine = current_app.extensions['replica_router'].engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.db = None
+        self.retry_seconds = 30
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = {'replica_requests': 0, 'primary_fallbacks': 0, 'failures': 0}
+
+    def init_app(self, app, db):
+        self.db = db
+        self.retry_seconds = app.config.get('REPLICA_RETRY_SECONDS', 30)
+        app.extensions['replica_router'] = self
+        with app.app_context():
+            engine = db.engines.get('replica')
+        if engine is not None:
+            event.listen(engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context):
+        # Pre-ping failures are retried on a fresh connection by the pool
+        if context.is_pre_ping:
+            return
+        error = context.sqlalchemy_exception
+        if context.is_disconnect or (isinstance(error, DBAPIError) and not isinstance(error, QUERY_ERRORS)):
+            if has_request_context():
+                g.db_replica_error = str(context.original_exception)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def configured(self):
+        return self.db is not None and 'replica' in self.db.engines
+
+    def engine(self):
+        # -> the replica engine, or None to use the primary
+        if not self.configured() or time.monotonic() < self.down_until:
+            return None
+        return self.db.engines['replica']
+
+    def mark_down(self, error):
+        self.down_until = time.monotonic() + self.retry_seconds
+        self._count('failures')
+        current_app.logger.warning(
+            f"Read replica unavailable, using the primary for {self.retry_seconds}s: {error}")
+
+    def read_only(self, fn):
+        # Place below the auth and response cache decorators
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if self.engine() is None:
+                return fn(*args, **kwargs)
+
+            g.db_replica = True
+            g.db_replica_error = None
+            try:
+                response = fn(*args, **kwargs)
+            finally:
+                g.db_replica = False
+            if g.db_replica_error is None:
+                self._count('replica_requests')
+                return response
+
+            # Routes turn DB errors into their own 500s, so the failure is
+            # noticed through the engine hook rather than an exception here
+            self.mark_down(g.db_replica_error)
+            self.db.session.rollback()
+            self._count('primary_fallbacks')
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def stats(self):
+        if not self.configured():
+            state = 'disabled'
+        else:
+            state = 'unavailable' if time.monotonic() < self.down_until else 'available'
+        with self._lock:
+            return {'state': state, **self.counters}
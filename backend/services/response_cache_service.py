@@ -0,0 +1,158 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import request, make_response, current_app
+
+# Cached JSON responses for the admin analytics endpoints, per process.
+# Entries expire after RESPONSE_CACHE_TTL seconds. Recording an upload,
+# anomaly or lock moves the cache generation on: the time of the change,
+# kept in the activity counter backend (ACTIVITY_COUNTER_BACKEND) that every
+# worker shares. Each request reads the generation first and only serves
+# entries computed under it, so no worker serves data another one has
+# invalidated. With the memory backend the generation is per process, and
+# the TTL is the most a dashboard can lag behind under several workers.
+# If the backend can't be read the cache is bypassed.
+#
+# ETags hash the generation with the body: they stay valid across workers
+# and restarts until the next change, and a client never gets a 304 for a
+# response from before it.
+
+
+def normalize_param(name, value):
+    value = value.strip()
+    if name in ('date_from', 'date_to'):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+        except ValueError:
+            return value
+    if name == 'blocked':
+        return value.lower()
+    return value
+
+
+class ResponseCacheService:
+    # Longer than any entry lives; once the marker expires the generation is
+    # None until the next change, which is just as consistent.
+    GENERATION_SECONDS = 24 * 60 * 60
+
+    def __init__(self, ttl=None, max_entries=None, backend=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("RESPONSE_CACHE_ENTRIES", "256"))
+        self._backend = backend
+
+        # (endpoint, params) -> (body, status, etag, expires, generation)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0, 'backend_errors': 0}
+
+    @property
+    def backend(self):
+        # Created on first use: the counter backends import the extensions
+        if self._backend is None:
+            from services.activity_counter_service import counter_backend_from_env
+            self._backend = counter_backend_from_env(self.GENERATION_SECONDS)
+        return self._backend
+
+    def _generation_key(self):
+        from services.activity_counter_service import database_namespace
+        return f"dlp:{database_namespace()}:response_cache_generation"
+
+    def generation(self):
+        # -> the shared generation (None before the first change); raises if
+        # the backend is unavailable
+        generation = self.backend.get(self._generation_key())
+        return repr(float(generation)) if generation is not None else None
+
+    def key(self, params):
+        # Only the listed parameters count, blank ones are the same as missing
+        values = ((name, request.args.get(name, '')) for name in params)
+        return (request.endpoint, tuple((name, normalize_param(name, value)) for name, value in values
+                                        if value.strip()))
+
+    def _get(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] <= time.monotonic() or entry[4] != generation:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, body, status, etag, generation):
+        with self._lock:
+            self._entries[key] = (body, status, etag, time.monotonic() + self.ttl, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.counters['invalidations'] += 1
+        try:
+            self.backend.put(self._generation_key(), time.time(), self.GENERATION_SECONDS)
+        except Exception as e:
+            self._count('backend_errors')
+            current_app.logger.error(f"Response cache invalidation not shared, other workers may lag by up to {self.ttl}s: {e}")
+
+    def _respond(self, body, status, etag):
+        if request.if_none_match.contains(etag):
+            self._count('not_modified')
+            response = make_response('', 304)
+        else:
+            response = make_response(body, status)
+            response.mimetype = 'application/json'
+        response.set_etag(etag)
+        # Let browsers keep the body but always revalidate it
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def cached(self, params=()):
+        # Goes below the auth decorator: access is checked on every request.
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if self.ttl <= 0:
+                    return fn(*args, **kwargs)
+
+                try:
+                    generation = self.generation()
+                except Exception as e:
+                    self._count('backend_errors')
+                    current_app.logger.warning(f"Response cache generation unavailable, not caching: {e}")
+                    return fn(*args, **kwargs)
+
+                key = self.key(params)
+                entry = self._get(key, generation)
+                if entry is not None:
+                    self._count('hits')
+                    return self._respond(*entry[:3])
+
+                self._count('misses')
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                etag = hashlib.sha1(f"{generation}:".encode() + body).hexdigest()
+                # Computed from data that was invalidated meanwhile: don't keep it
+                try:
+                    unchanged = self.generation() == generation
+                except Exception:
+                    unchanged = False
+                if unchanged:
+                    self._put(key, body, response.status_code, etag, generation)
+                return self._respond(body, response.status_code, etag)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'ttl_seconds': self.ttl, **self.counters}
@@ -0,0 +1,58 @@
+import time
+from datetime import timedelta
+from flask import current_app, jsonify
+from models import User
+from services.activity_counter_service import counter_backend_from_env, database_namespace
+
+TOKEN_LIFETIME = timedelta(days=1)
+
+
+# ==========================
+# TOKEN CLAIMS & REVOCATION
+# ==========================
+# Access tokens carry the user's role and lock state, so authorization needs
+# no user lookup. When either of those (or the password) changes, the user's
+# tokens issued before that moment are revoked: the time is kept in the
+# activity counter backend (ACTIVITY_COUNTER_BACKEND), which every worker
+# shares, for as long as such a token could still be valid.
+class RevocationService:
+    def __init__(self, backend=None):
+        self.lifetime = TOKEN_LIFETIME
+        self.backend = backend if backend is not None else counter_backend_from_env(int(self.lifetime.total_seconds()))
+
+    def init_app(self, jwt):
+        jwt.token_in_blocklist_loader(self.is_revoked)
+        jwt.revoked_token_loader(self._revoked_response)
+
+    def _key(self, user_id):
+        return f"dlp:{database_namespace()}:revoked:{user_id}"
+
+    def claims(self, user):
+        # auth_time keeps sub-second precision ("iat" is whole seconds), so a
+        # token issued right after a revocation is not caught by it
+        return {
+            "role": (user.role or "").lower(),
+            "locked": bool(user.is_locked),
+            "auth_time": time.time()
+        }
+
+    def revoke(self, user_id):
+        try:
+            self.backend.put(self._key(user_id), time.time(), self.lifetime.total_seconds())
+        except Exception as e:
+            current_app.logger.error(f"Token revocation failed for user {user_id}: {e}")
+
+    def is_revoked(self, jwt_header, jwt_payload):
+        user_id = jwt_payload["sub"]
+        try:
+            revoked_at = self.backend.get(self._key(user_id))
+        except Exception as e:
+            # Backend down: compare the claims with the user row instead
+            current_app.logger.warning(f"Revocation cache unavailable, checking the DB: {e}")
+            user = User.query.get(int(user_id))
+            return (user is None or bool(user.is_locked) != jwt_payload.get("locked")
+                    or (user.role or "").lower() != jwt_payload.get("role"))
+        return revoked_at is not None and jwt_payload.get("auth_time", 0) < revoked_at
+
+    def _revoked_response(self, jwt_header, jwt_payload):
+        return jsonify({"success": False, "message": "Session expired, please log in again"}), 401
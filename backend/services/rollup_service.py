@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import mysql, sqlite
+from extensions import db
+from models import File, DailyUploadRollup, HourlyUploadRollup
+
+ROLLUP_COUNTERS = ('uploads', 'total_bytes', 'risk_score_sum')
+
+
+class RollupService:
+    def __init__(self):
+        # (model, name of its bucket column, bucket of an upload time)
+        self.rollups = [
+            (DailyUploadRollup, 'day', lambda moment: moment.date()),
+            (HourlyUploadRollup, 'hour', lambda moment: moment.replace(minute=0, second=0, microsecond=0))
+        ]
+
+    def _aggregate(self, files):
+        # File rows -> {model: {key: [uploads, bytes, risk score sum]}}
+        deltas = {model: {} for model, _, _ in self.rollups}
+        for f in files:
+            for model, _, bucket_of in self.rollups:
+                key = (bucket_of(f.upload_time), f.user_id, f.risk_level or 'Low', bool(f.is_blocked))
+                totals = deltas[model].setdefault(key, [0, 0, 0])
+                totals[0] += 1
+                totals[1] += f.filesize or 0
+                totals[2] += f.risk_score or 0
+        return deltas
+
+    def rows(self, files):
+        # -> [(model, bucket column, rows to add)] for a batch of File rows
+        deltas_by_model = self._aggregate(files)
+        return [(model, bucket_column, [{
+            bucket_column: bucket,
+            'user_id': user_id,
+            'risk_level': risk_level,
+            'is_blocked': is_blocked,
+            'uploads': uploads,
+            'total_bytes': total_bytes,
+            'risk_score_sum': risk_score_sum
+        } for (bucket, user_id, risk_level, is_blocked), (uploads, total_bytes, risk_score_sum)
+            in deltas_by_model[model].items()]) for model, bucket_column, _ in self.rollups]
+
+    def _upsert(self, model, bucket_column, rows):
+        table = model.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            stmt = mysql.insert(table).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                {name: table.c[name] + stmt.inserted[name] for name in ROLLUP_COUNTERS}
+            )
+            db.session.execute(stmt)
+        elif dialect == 'sqlite':
+            stmt = sqlite.insert(table).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[bucket_column, 'user_id', 'risk_level', 'is_blocked'],
+                set_={name: table.c[name] + stmt.excluded[name] for name in ROLLUP_COUNTERS}
+            )
+            db.session.execute(stmt)
+        else:
+            for row in rows:
+                key = [table.c[name] == row[name] for name in (bucket_column, 'user_id', 'risk_level', 'is_blocked')]
+                updated = db.session.execute(table.update().where(*key).values(
+                    {name: table.c[name] + row[name] for name in ROLLUP_COUNTERS}
+                ))
+                if updated.rowcount == 0:
+                    db.session.execute(table.insert().values(row))
+
+    def record(self, files):
+        # Called with the new File rows before the upload commits, so the
+        # rollups move in the same transaction. File.upload_time must be set.
+        for model, bucket_column, rows in self.rows(files):
+            if rows:
+                self._upsert(model, bucket_column, rows)
+
+    def backfill(self, since=None, until=None, report=print):
+        # Rebuilds the rollups one day at a time from the files table. Each day
+        # is replaced in its own transaction; run it while uploads are paused
+        # or for days that are already closed.
+        first = since or db.session.query(db.func.min(File.upload_time)).scalar()
+        if first is None:
+            report("No files to roll up.")
+            return 0
+        day = first.date() if isinstance(first, datetime) else first
+        last = until or datetime.utcnow().date()
+
+        total = 0
+        while day <= last:
+            start = datetime.combine(day, datetime.min.time())
+            end = start + timedelta(days=1)
+            files = File.query.with_entities(
+                File.upload_time, File.user_id, File.risk_level, File.is_blocked, File.filesize, File.risk_score
+            ).filter(File.upload_time >= start, File.upload_time < end).all()
+
+            DailyUploadRollup.query.filter(DailyUploadRollup.day == day).delete(synchronize_session=False)
+            HourlyUploadRollup.query.filter(
+                HourlyUploadRollup.hour >= start, HourlyUploadRollup.hour < end
+            ).delete(synchronize_session=False)
+            self.record(files)
+            db.session.commit()
+
+            if files:
+                report(f"{day}: {len(files)} file(s)")
+            total += len(files)
+            day += timedelta(days=1)
+        return total
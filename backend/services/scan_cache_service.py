@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from extensions import db, metrics
+from models import ScanCache
+
+LOOKUP_RESULTS = {'db_hits': 'db_hit', 'misses': 'miss'}
+
+
+class ScanCacheService:
+    def __init__(self, pattern_version, memory_limit=None, db_limit=None):
+        self.pattern_version = pattern_version
+        self.memory_limit = memory_limit if memory_limit is not None else int(os.getenv("SCAN_CACHE_MEMORY_ENTRIES", "1024"))
+        self.db_limit = db_limit if db_limit is not None else int(os.getenv("SCAN_CACHE_DB_ENTRIES", "100000"))
+        self.hits_flush_seconds = float(os.getenv("SCAN_CACHE_HITS_FLUSH_SECONDS", "60"))
+
+        # In-process LRU tier: (content_hash, extractor) -> result dict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stale_purged = False
+        self._puts_since_trim = 0
+
+        # Hit counts and last use, written to the DB in batches: key -> (hits, last_used)
+        self._pending_hits = {}
+        self._hits_flushed_at = time.monotonic()
+
+        self.counters = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.memory_limit:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+        if name in LOOKUP_RESULTS:
+            metrics.scan_cache.labels(LOOKUP_RESULTS[name]).inc()
+
+    def _note_hit(self, key, now):
+        # Caller holds self._lock
+        hits, _ = self._pending_hits.get(key, (0, None))
+        self._pending_hits[key] = (hits + 1, now)
+
+    def flush_hits(self):
+        # Best effort, on its own connection and outside the caller's
+        # transaction: hits and last_used only steer trimming.
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+            self._hits_flushed_at = time.monotonic()
+        if not pending:
+            return
+
+        table = ScanCache.__table__
+        stmt = table.update().where(
+            table.c.content_hash == bindparam('key_hash'),
+            table.c.extractor == bindparam('key_extractor'),
+            table.c.pattern_version == self.pattern_version
+        ).values(
+            hits=db.func.coalesce(table.c.hits, 0) + bindparam('new_hits'),
+            last_used=bindparam('used_at')
+        )
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(stmt, [
+                    {'key_hash': content_hash, 'key_extractor': extractor, 'new_hits': hits, 'used_at': used_at}
+                    for (content_hash, extractor), (hits, used_at) in sorted(pending.items())
+                ])
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f"Scan cache hit counts dropped ({len(pending)} key(s)): {e}")
+
+    def _purge_stale(self):
+        # Rows written under another pattern set can never be hit again.
+        if self._stale_purged:
+            return
+        self._stale_purged = True
+        try:
+            ScanCache.query.filter(ScanCache.pattern_version != self.pattern_version).delete(synchronize_session=False)
+        except SQLAlchemyError:
+            self._stale_purged = False
+
+    def _trim_db(self):
+        excess = ScanCache.query.count() - self.db_limit
+        if excess <= 0:
+            return
+        stale_ids = [row.id for row in ScanCache.query.with_entities(ScanCache.id)
+                     .order_by(ScanCache.last_used.asc()).limit(excess)]
+        ScanCache.query.filter(ScanCache.id.in_(stale_ids)).delete(synchronize_session=False)
+        self.counters['evictions'] += len(stale_ids)
+
+    def get(self, content_hash, extractor):
+        key = (content_hash, extractor)
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        # keys: [(content_hash, extractor)] -> {key: result} for the keys that hit.
+        # Misses in memory are resolved with a single query.
+        # Flushed before this request has written anything, so the separate
+        # connection never waits on locks the caller holds.
+        if time.monotonic() - self._hits_flushed_at >= self.hits_flush_seconds:
+            self.flush_hits()
+
+        found = {}
+        missing = []
+        now = datetime.utcnow()
+        with self._lock:
+            for key in keys:
+                result = self._entries.get(key)
+                if result is not None:
+                    self._entries.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    self._note_hit(key, now)
+                    found[key] = result
+                elif key not in missing:
+                    missing.append(key)
+        if found:
+            metrics.scan_cache.labels('memory_hit').inc(len(found))
+
+        if not missing:
+            return found
+
+        self._purge_stale()
+        # Plain columns, not entities: reading must not leave rows for the
+        # caller's transaction to write back.
+        rows = db.session.query(
+            ScanCache.content_hash, ScanCache.extractor, ScanCache.detected_counts,
+            ScanCache.risk_score, ScanCache.risk_level
+        ).filter(
+            ScanCache.pattern_version == self.pattern_version,
+            ScanCache.content_hash.in_({content_hash for content_hash, _ in missing})
+        ).all()
+        rows_by_key = {(row.content_hash, row.extractor): row for row in rows}
+
+        for key in missing:
+            row = rows_by_key.get(key)
+            if row is None:
+                self._count('misses')
+                continue
+
+            with self._lock:
+                self._note_hit(key, now)
+            result = {
+                'detected_counts': json.loads(row.detected_counts),
+                'risk_score': row.risk_score,
+                'risk_level': row.risk_level
+            }
+            self._remember(key, result)
+            self._count('db_hits')
+            found[key] = result
+        return found
+
+    def put(self, content_hash, extractor, detected_counts, risk_score, risk_level):
+        result = {
+            'detected_counts': detected_counts,
+            'risk_score': risk_score,
+            'risk_level': risk_level
+        }
+        self._remember((content_hash, extractor), result)
+        self._count('stores')
+
+        # Savepoint so a concurrent insert of the same content only drops the
+        # cache row, never the caller's transaction.
+        try:
+            with db.session.begin_nested():
+                db.session.add(ScanCache(
+                    content_hash=content_hash,
+                    extractor=extractor,
+                    pattern_version=self.pattern_version,
+                    detected_counts=json.dumps(detected_counts),
+                    risk_score=risk_score,
+                    risk_level=risk_level
+                ))
+        except IntegrityError:
+            pass
+
+        self._puts_since_trim += 1
+        if self._puts_since_trim >= 100:
+            self._puts_since_trim = 0
+            self._trim_db()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            memory_entries = len(self._entries)
+            pending_hits = len(self._pending_hits)
+        lookups = counters['memory_hits'] + counters['db_hits'] + counters['misses']
+        hits = counters['memory_hits'] + counters['db_hits']
+        return {
+            **counters,
+            'memory_entries': memory_entries,
+            'memory_limit': self.memory_limit,
+            'db_limit': self.db_limit,
+            'pattern_version': self.pattern_version,
+            'pending_hit_updates': pending_hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0
+        }
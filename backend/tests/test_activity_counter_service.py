@@ -0,0 +1,40 @@
+import os
+import time
+import pytest
+from services.activity_counter_service import SQLiteCounterBackend
+
+
+def test_sqlite_backend_file_is_owner_only(tmp_path):
+    path = tmp_path / "counters" / "c.sqlite"
+    SQLiteCounterBackend(str(path))
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert os.stat(path.parent).st_mode & 0o077 == 0
+
+    os.chmod(path, 0o666)
+    SQLiteCounterBackend(str(path))
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_sqlite_backend_refuses_a_symlink(tmp_path):
+    target = tmp_path / "real.sqlite"
+    SQLiteCounterBackend(str(target))
+    link = tmp_path / "link.sqlite"
+    link.symlink_to(target)
+    with pytest.raises(OSError):
+        SQLiteCounterBackend(str(link))
+
+
+def test_sqlite_backend_prunes_expired_values_and_markers(tmp_path):
+    backend = SQLiteCounterBackend(str(tmp_path / "c.sqlite"))
+    for i in range(500):
+        backend.put(f"gone{i}", 1, 0.01)
+        backend.mark_warm(f"gone{i}", 0.01)
+    time.sleep(0.05)
+    backend.put("kept", 2, 60)
+    # Pruned every 1000 writes
+    for i in range(1000):
+        backend.incr("bucket", 0, 1)
+
+    assert backend._conn.execute("SELECT COUNT(*) FROM counter_values").fetchone()[0] == 1
+    assert backend._conn.execute("SELECT COUNT(*) FROM counter_warm").fetchone()[0] == 0
+    assert backend.get("kept") == 2
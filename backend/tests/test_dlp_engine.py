@@ -0,0 +1,140 @@
+import re
+import random
+import pytest
+from services.dlp_engine import (
+    DLPEngine, LinearEmailMatcher, validate_cards, validate_aadhaar, validate_pan
+)
+
+# Fragments that make detectors fire, nearly fire, or break off at awkward
+# places: numbers with separators, '@' runs, PAN-like and password-like text.
+FRAGMENTS = [
+    "4111 1111 1111 1111", "4111111111111112", "2345 6789 0124", "ABCPE1234F", "ABCDE1234F",
+    "a.b@ex.com", "Aa@b.comaz8-a@b.com", "x@y", "+1 (415) 555-0100", "password = hunter2",
+    "PWD:'x'", "sk_live_" + "a" * 20, "AIza", "0", "7", "a", "Z", ".", "-", "_", "+", "@",
+    "|", "%", " ", "  ", "\n", ",", ":", "'"
+]
+
+
+def random_text(rng, max_fragments=40):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, max_fragments)))
+
+
+def findall_counts(engine, text):
+    # What the original scanner counted: one re.findall per detector
+    counts = {}
+    for label, pattern in engine.patterns.items():
+        found = len(re.findall(pattern, text))
+        if found:
+            counts[label] = found
+    return counts
+
+
+def scan_in_pieces(engine, text, step):
+    return engine.scan_stream(text[i:i + step] for i in range(0, len(text), step))
+
+
+@pytest.fixture
+def unvalidated(monkeypatch):
+    monkeypatch.setenv("DLP_VALIDATORS", "off")
+
+    def make(**kwargs):
+        return DLPEngine(**kwargs)
+    return make
+
+
+# ==========================
+# DIFFERENTIAL: PREFILTERS AND STREAMING
+# ==========================
+@pytest.mark.parametrize("regex_mode", ["linear", "backtracking"])
+def test_scan_text_matches_findall(unvalidated, monkeypatch, regex_mode):
+    monkeypatch.setenv("DLP_REGEX_MODE", regex_mode)
+    engine = unvalidated()
+    rng = random.Random(1)
+    for _ in range(500):
+        text = random_text(rng)
+        assert engine.scan_text(text) == findall_counts(engine, text), text
+
+
+@pytest.mark.parametrize("block_size, overlap", [(1, 1), (1, 30), (3, 8), (16, 64), (64, 4)])
+def test_scan_stream_matches_findall_with_small_blocks(unvalidated, block_size, overlap):
+    engine = unvalidated(block_size=block_size, overlap=overlap)
+    rng = random.Random(block_size * 1000 + overlap)
+    for _ in range(300):
+        text = random_text(rng)
+        step = rng.choice([1, 2, 5, 13])
+        assert scan_in_pieces(engine, text, step) == findall_counts(engine, text), (text, step)
+
+
+def test_scan_stream_holds_back_matches_at_the_buffer_end(unvalidated):
+    # Long runs of email characters end buffers in the middle of an address,
+    # where a trailing \b would otherwise succeed against the buffer end
+    engine = unvalidated(block_size=1, overlap=30)
+    rng = random.Random(5)
+    for _ in range(500):
+        text = "".join(rng.choice("8+_-7Aa@b.comz4") for _ in range(rng.randint(1, 200)))
+        assert scan_in_pieces(engine, text, rng.choice([1, 2, 7])) == findall_counts(engine, text), text
+
+
+def test_scan_stream_matches_scan_text_with_validators():
+    engine = DLPEngine(block_size=4, overlap=16)
+    rng = random.Random(2)
+    for _ in range(300):
+        text = random_text(rng)
+        assert scan_in_pieces(engine, text, 3) == engine.scan_text(text), text
+
+
+# ==========================
+# LINEAR EMAIL MATCHER
+# ==========================
+def test_linear_email_matcher_matches_regex():
+    regex = DLPEngine().compiled["Email Address"]
+    matcher = LinearEmailMatcher(regex)
+    rng = random.Random(3)
+    for _ in range(2000):
+        text = "".join(rng.choice("ab.Z9_%+-|@ ") for _ in range(rng.randint(0, 40)))
+        pos = rng.randint(0, len(text))
+        endpos = rng.randint(pos, len(text))
+        expected = [m.span() for m in regex.finditer(text, pos, endpos)]
+        assert [m.span() for m in matcher.finditer(text, pos, endpos)] == expected, (text, pos, endpos)
+
+
+def test_linear_email_matcher_on_adversarial_input():
+    regex = DLPEngine().compiled["Email Address"]
+    text = "a." * 20000 + "@"
+    assert list(LinearEmailMatcher(regex).finditer(text)) == []
+
+
+# ==========================
+# CHECKSUM VALIDATORS
+# ==========================
+def test_validate_cards():
+    valid = ["4111111111111111", "4111 1111 1111 1111", "5500-0000-0000-0004", "378282246310005", "6011111111111117"]
+    invalid = ["4111111111111112", "4111 1111 1111 1121", "378282246310006", "1234567812345678"]
+    assert validate_cards(valid) == [True] * len(valid)
+    assert validate_cards(invalid) == [False] * len(invalid)
+
+
+def test_validate_aadhaar():
+    # Check digits from a reference Verhoeff implementation
+    valid = ["2345 6789 0124", "491837450276", "8765 4321 0988", "300000000001", "9999 9999 9999"]
+    invalid = [
+        "2345 6789 0125",   # wrong check digit
+        "2345 6789 1024",   # adjacent digits swapped
+        "1345 6789 0124",   # never issued: starts with 1
+        "0000 0000 0000",
+        "2345 6789 012"     # too short
+    ]
+    assert validate_aadhaar(valid) == [True] * len(valid)
+    assert validate_aadhaar(invalid) == [False] * len(invalid)
+
+
+def test_validate_pan():
+    assert validate_pan(["ABCPE1234F", "AAACB1234Z", "BBBTZ9999A"]) == [True, True, True]
+    # 4th character must be a holder type, and 0000 is never issued
+    assert validate_pan(["ABCDE1234F", "ABCXE1234F", "ABCPE0000F"]) == [False, False, False]
+
+
+def test_validators_reject_candidates():
+    counts = DLPEngine().scan_text("4111 1111 1111 1111 4111 1111 1111 1112 ABCPE1234F ABCDE1234F")
+    assert counts["Credit Card"] == 1
+    assert counts["PAN Card"] == 1
@@ -0,0 +1,88 @@
+import io
+import os
+import random
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+from services.encryption_service import EncryptionService, SEGMENT_HEADER, SEGMENT_TAG_SIZE
+
+SEGMENT_SIZE = 16
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("AES_KEY", Fernet.generate_key().decode())
+    monkeypatch.setenv("ENCRYPTION_SEGMENT_SIZE", str(SEGMENT_SIZE))
+    monkeypatch.setenv("ENCRYPTION_FILE_FORMAT", "segmented")
+    return EncryptionService()
+
+
+def encrypt_to(service, path, data):
+    service.encrypt_stream_to_file(io.BytesIO(data), str(path))
+    return str(path)
+
+
+@pytest.mark.parametrize("size", [0, 1, SEGMENT_SIZE - 1, SEGMENT_SIZE, SEGMENT_SIZE + 1, 5 * SEGMENT_SIZE + 3])
+def test_decrypt_range_matches_slices(service, tmp_path, size):
+    data = os.urandom(size)
+    path = encrypt_to(service, tmp_path / "blob", data)
+    rng = random.Random(size)
+    for _ in range(100):
+        offset = rng.randint(0, size + 4)
+        length = rng.randint(0, size + 4)
+        assert service.decrypt_range(path, offset, length) == data[offset:offset + length], (offset, length)
+
+
+def test_decrypt_range_rejects_negative_arguments(service, tmp_path):
+    path = encrypt_to(service, tmp_path / "blob", b"data")
+    with pytest.raises(ValueError):
+        service.decrypt_range(path, -1, 2)
+    with pytest.raises(ValueError):
+        service.decrypt_range(path, 0, -2)
+
+
+def test_decrypt_range_reads_legacy_fernet_files(service, tmp_path):
+    data = os.urandom(100)
+    path = tmp_path / "legacy"
+    path.write_bytes(service.cipher.encrypt(data))
+    assert not service.is_segmented(str(path))
+    assert service.decrypt_range(str(path), 10, 30) == data[10:40]
+
+
+def test_decrypt_range_only_authenticates_the_segments_it_reads(service, tmp_path):
+    data = os.urandom(4 * SEGMENT_SIZE)
+    path = encrypt_to(service, tmp_path / "blob", data)
+    stored = bytearray(open(path, 'rb').read())
+    # Corrupt the third segment
+    stored[SEGMENT_HEADER.size + 2 * (SEGMENT_SIZE + SEGMENT_TAG_SIZE) + 1] ^= 1
+    with open(path, 'wb') as f:
+        f.write(stored)
+
+    assert service.decrypt_range(path, 0, 2 * SEGMENT_SIZE) == data[:2 * SEGMENT_SIZE]
+    with pytest.raises(InvalidTag):
+        service.decrypt_range(path, 2 * SEGMENT_SIZE, 1)
+    with pytest.raises(InvalidTag):
+        service.decrypt_file(path)
+
+
+def test_truncated_file_is_rejected(service, tmp_path):
+    data = os.urandom(3 * SEGMENT_SIZE)
+    path = encrypt_to(service, tmp_path / "blob", data)
+    stored = open(path, 'rb').read()
+    with open(path, 'wb') as f:
+        f.write(stored[:-(SEGMENT_SIZE + SEGMENT_TAG_SIZE)])
+    with pytest.raises(InvalidTag):
+        service.decrypt_file(path)
+    # The segment now read as the last one was not encrypted as the last one
+    with pytest.raises(InvalidTag):
+        service.decrypt_range(path, SEGMENT_SIZE, 1)
+
+
+def test_decrypt_file_to_streams_the_plaintext(service, tmp_path):
+    data = os.urandom(7 * SEGMENT_SIZE + 5)
+    path = encrypt_to(service, tmp_path / "blob", data)
+    assert service.is_segmented(path)
+    out = io.BytesIO()
+    service.decrypt_file_to(path, out)
+    assert out.getvalue() == data
+    assert service.decrypt_file(path) == data
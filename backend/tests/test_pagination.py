@@ -0,0 +1,57 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, Column, Integer, DateTime
+from sqlalchemy.orm import declarative_base, sessionmaker
+from utils.pagination import keyset_page, encode_cursor, decode_cursor
+
+Base = declarative_base()
+
+
+class Event(Base):
+    __tablename__ = 'events'
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime, nullable=True, index=True)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    # Shared timestamps, and rows without one
+    session.add_all(Event(timestamp=None if rng.random() < 0.2 else start + timedelta(minutes=rng.randrange(20)))
+                    for _ in range(60))
+    session.commit()
+    yield session
+    session.close()
+
+
+def expected_order(session):
+    events = session.query(Event).all()
+    dated = sorted((e for e in events if e.timestamp), key=lambda e: (e.timestamp, e.id), reverse=True)
+    undated = sorted((e for e in events if not e.timestamp), key=lambda e: e.id, reverse=True)
+    return [e.id for e in dated + undated]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 60, 100])
+def test_pages_cover_every_row_once_with_undated_rows_last(session, limit):
+    seen = []
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(session.query(Event), Event.timestamp, Event.id, cursor, limit)
+        assert len(rows) <= limit
+        seen += [row.id for row in rows]
+        if cursor is None:
+            break
+    assert seen == expected_order(session)
+
+
+def test_cursor_round_trips_a_missing_timestamp():
+    moment = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_cursor(encode_cursor(moment, 12)) == (moment, 12)
+    assert decode_cursor(encode_cursor(None, 12)) == (None, 12)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
@@ -1,17 +1,20 @@
 from functools import wraps
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
 from flask import jsonify
-from models import User
+
+# Authorization comes from the token's claims (see services/revocation_service.py);
+# tokens made stale by a lock, role or password change are rejected as revoked
+# while verify_jwt_in_request runs, so no user lookup is needed here.
 
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
             verify_jwt_in_request()
-            # JWT identity is stored as a string, convert to int for query
-            user_id = int(get_jwt_identity())
-            user = User.query.get(user_id)
-            if not user or user.role.lower() != 'admin':
+            claims = get_jwt()
+            if "role" not in claims:
+                return jsonify({"success": False, "message": "Session expired, please log in again"}), 401
+            if claims["role"] != 'admin':
                 return jsonify({"success": False, "message": "Admin access required"}), 403
             return fn(*args, **kwargs)
         except Exception as e:
@@ -24,9 +27,10 @@ def role_required(role):
         def wrapper(*args, **kwargs):
             try:
                 verify_jwt_in_request()
-                user_id = int(get_jwt_identity())
-                user = User.query.get(user_id)
-                if not user or user.role.lower() != role.lower():
+                claims = get_jwt()
+                if "role" not in claims:
+                    return jsonify({"success": False, "message": "Session expired, please log in again"}), 401
+                if claims["role"] != role.lower():
                     return jsonify({"success": False, "message": f"{role} access required"}), 403
                 return fn(*args, **kwargs)
             except Exception as e:
@@ -0,0 +1,62 @@
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(timestamp, row_id):
+    # A row without a timestamp gives a null timestamp
+    payload = json.dumps([timestamp.isoformat() if timestamp is not None else None, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # Raises ValueError for anything that encode_cursor did not produce
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(timestamp) if timestamp is not None else None), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def page_limit(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        limit = int(value) if value else default
+    except ValueError:
+        limit = default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, time_column, id_column, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    # Newest first on (time, id), then the rows without a time by id. The
+    # cursor is the last row of the previous page, so each page is an index
+    # range scan no matter how deep it is.
+    # -> (rows, next cursor or None)
+    timestamp, row_id = decode_cursor(cursor) if cursor else (None, None)
+    rows = []
+    if not cursor or timestamp is not None:
+        dated = query.filter(time_column.isnot(None))
+        if cursor:
+            # The redundant "<=" gives the planner a range on the time index
+            dated = dated.filter(
+                time_column <= timestamp,
+                or_(time_column < timestamp, id_column < row_id)
+            )
+        rows = dated.order_by(time_column.desc(), id_column.desc()).limit(limit + 1).all()
+        row_id = None
+    if len(rows) <= limit:
+        undated = query.filter(time_column.is_(None))
+        if row_id is not None:
+            undated = undated.filter(id_column < row_id)
+        rows += undated.order_by(id_column.desc()).limit(limit + 1 - len(rows)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
@@ -8,6 +8,8 @@ CREATE TABLE IF NOT EXISTS users (
     email VARCHAR(100) NOT NULL UNIQUE,
     password_hash VARCHAR(255) NOT NULL,
     role ENUM('Admin', 'User') DEFAULT 'User',
+    is_locked BOOLEAN DEFAULT FALSE,
+    profile_photo VARCHAR(255) NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -17,10 +19,16 @@ CREATE TABLE IF NOT EXISTS files (
     user_id INT NOT NULL,
     filename VARCHAR(255) NOT NULL,
     encrypted_path VARCHAR(500) NOT NULL,
+    content_hash VARCHAR(64), -- blobs.content_hash; NULL until `python blobs.py import`
     is_blocked BOOLEAN DEFAULT FALSE,
-    detected_types TEXT, -- JSON or comma-separated list of sensitive data types
     filesize INT, -- in bytes
+    risk_score INT DEFAULT 0,
+    risk_level VARCHAR(20) DEFAULT 'Low',
     upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_files_user_time (user_id, upload_time),
+    KEY ix_files_user_risk_time (user_id, risk_level, upload_time),
+    KEY ix_files_upload_time (upload_time),
+    KEY ix_files_content_hash (content_hash),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
@@ -32,6 +40,7 @@ CREATE TABLE IF NOT EXISTS logs (
     details TEXT,
     ip_address VARCHAR(45),
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_logs_timestamp (timestamp),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
 );
 
@@ -43,5 +52,107 @@ CREATE TABLE IF NOT EXISTS anomaly_logs (
     severity ENUM('Low', 'Medium', 'High', 'Critical') DEFAULT 'Medium',
     details TEXT,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_anomaly_logs_timestamp (timestamp),
+    KEY ix_anomaly_logs_user_id (user_id),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
+
+-- 5. Scan result cache keyed by uploaded content
+CREATE TABLE IF NOT EXISTS scan_cache (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    content_hash CHAR(64) NOT NULL, -- SHA-256 of the uploaded bytes
+    extractor VARCHAR(10) NOT NULL,
+    pattern_version VARCHAR(16) NOT NULL,
+    detected_counts TEXT NOT NULL, -- JSON object of label -> count
+    risk_score INT DEFAULT 0,
+    risk_level VARCHAR(20) DEFAULT 'Low',
+    hits INT DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_scan_cache_key (content_hash, extractor, pattern_version),
+    KEY ix_scan_cache_last_used (last_used)
+);
+
+-- 6. Background upload jobs
+CREATE TABLE IF NOT EXISTS upload_jobs (
+    id CHAR(32) PRIMARY KEY, -- uuid4 hex
+    user_id INT NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    filesize INT,
+    status VARCHAR(20) DEFAULT 'queued',
+    stage VARCHAR(50),
+    progress INT DEFAULT 0,
+    http_status INT,
+    result TEXT, -- JSON body of the finished upload
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_upload_jobs_user_id (user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- 7. Applied migrations (backend/migrate.py). Run `python migrate.py` after
+--    creating the schema; migrations already reflected above are recorded
+--    without changing anything.
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(32) PRIMARY KEY,
+    description VARCHAR(255),
+    applied_at DATETIME
+);
+
+-- 8. Upload rollups for the admin dashboard, kept current by the upload path
+--    (backend/services/rollup_service.py); `python rollups.py backfill`
+--    rebuilds them from the files table.
+CREATE TABLE IF NOT EXISTS upload_rollups_daily (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    day DATE NOT NULL,
+    user_id INT NOT NULL,
+    risk_level VARCHAR(20) NOT NULL,
+    is_blocked BOOLEAN NOT NULL,
+    uploads INT NOT NULL DEFAULT 0,
+    total_bytes BIGINT NOT NULL DEFAULT 0,
+    risk_score_sum BIGINT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_upload_rollups_daily_key (day, user_id, risk_level, is_blocked),
+    KEY ix_upload_rollups_daily_user_id (user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS upload_rollups_hourly (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    hour DATETIME NOT NULL, -- UTC, truncated to the hour
+    user_id INT NOT NULL,
+    risk_level VARCHAR(20) NOT NULL,
+    is_blocked BOOLEAN NOT NULL,
+    uploads INT NOT NULL DEFAULT 0,
+    total_bytes BIGINT NOT NULL DEFAULT 0,
+    risk_score_sum BIGINT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_upload_rollups_hourly_key (hour, user_id, risk_level, is_blocked),
+    KEY ix_upload_rollups_hourly_user_id (user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- 9. Sensitive data types found per file (replaces files.detected_types)
+CREATE TABLE IF NOT EXISTS detections (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    file_id INT NOT NULL,
+    user_id INT NOT NULL, -- copied from the file for per-user breakdowns
+    detection_type VARCHAR(50) NOT NULL,
+    count INT NOT NULL DEFAULT 1, -- matches of this type in the file
+    UNIQUE KEY uq_detections_file_type (file_id, detection_type),
+    KEY ix_detections_type_file (detection_type, file_id),
+    KEY ix_detections_user_type (user_id, detection_type),
+    FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- 10. Encrypted upload content, stored once per distinct content
+--     (backend/services/blob_store_service.py). `python blobs.py gc` removes
+--     blobs no file references.
+CREATE TABLE IF NOT EXISTS blobs (
+    content_hash VARCHAR(64) PRIMARY KEY, -- keyed hash of the plaintext
+    path VARCHAR(500) NOT NULL,
+    size BIGINT NOT NULL DEFAULT 0, -- plaintext bytes
+    ref_count INT NOT NULL DEFAULT 0, -- files with this content_hash
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, -- last reference added
+    KEY ix_blobs_ref_count_updated (ref_count, updated_at)
+);